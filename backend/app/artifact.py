@@ -0,0 +1,59 @@
+import json
+import numpy as np
+
+from app.scorer import CompiledScorer
+
+# Pickle-free model artifact: a small JSON document that only needs NumPy to load.
+# Floats are written with repr(), so coefficients round-trip exactly.
+ARTIFACT_FORMAT = "heart-disease-lr"
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_FILENAME = "model.json"
+
+
+def export_artifact(model, scaler, feature_names, metadata=None):
+    """Describe a fitted StandardScaler + LogisticRegression as a plain dict"""
+    coef = np.asarray(model.coef_, dtype=np.float64).ravel()
+    if len(coef) != len(feature_names):
+        raise ValueError(f"Model has {len(coef)} coefficients but {len(feature_names)} feature names")
+
+    return {
+        "format": ARTIFACT_FORMAT,
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "feature_names": list(feature_names),
+        "coef": coef.tolist(),
+        "intercept": float(np.asarray(model.intercept_, dtype=np.float64).ravel()[0]),
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64).tolist(),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64).tolist(),
+        "threshold": 0.5,
+        "metadata": dict(metadata or {}),
+    }
+
+
+def save_artifact(path, artifact):
+    with open(path, 'w') as f:
+        json.dump(artifact, f, indent=2)
+
+
+def load_artifact(path):
+    """Read and validate an artifact; returns (scorer, feature_names, metadata)"""
+    with open(path) as f:
+        artifact = json.load(f)
+
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a {ARTIFACT_FORMAT} artifact")
+    if artifact.get("format_version", 0) > ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"{path} uses format version {artifact['format_version']}, "
+                         f"this server supports up to {ARTIFACT_FORMAT_VERSION}")
+
+    n_features = len(artifact["feature_names"])
+    for key in ("coef", "scaler_mean", "scaler_scale"):
+        if len(artifact[key]) != n_features:
+            raise ValueError(f"{path}: '{key}' has {len(artifact[key])} values, expected {n_features}")
+
+    scorer = CompiledScorer.from_coefficients(
+        artifact["coef"], artifact["intercept"],
+        artifact["scaler_mean"], artifact["scaler_scale"]
+    )
+    scorer.threshold = artifact.get("threshold", 0.5)
+
+    return scorer, artifact["feature_names"], artifact.get("metadata", {})
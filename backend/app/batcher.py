@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+# A busy server holds each batch open this long for more /predict calls;
+# a batch never holds more rows than MAX_BATCH_SIZE
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64"))
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent single-row inference requests and scores them as one matrix
+
+    `score_batch` takes a 2D feature matrix and returns one result per row;
+    each caller receives the result for its own row.
+
+    The first pending request opens a batch. If the previous batch held more
+    than one request (i.e. the server is busy), the batcher waits up to
+    `window_ms` for more requests; under light load it scores right away, so
+    a lone request never pays the window. A batch is closed early once it
+    reaches `max_batch_size`.
+    """
+
+    def __init__(self, score_batch, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.score_batch = score_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = None
+        self._task = None
+        self._last_batch_size = 0
+
+        # Metrics
+        self.total_requests = 0
+        self.total_batches = 0
+        self.batch_sizes = Counter()
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Fail anything still waiting
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction service is shutting down"))
+
+    async def submit(self, features):
+        """Queue one feature row and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, time.perf_counter(), future))
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+
+            if self.window > 0 and len(batch) < self.max_batch_size and self._last_batch_size > 1:
+                await asyncio.sleep(self.window)
+                self._drain(batch)
+
+            self._score(batch)
+
+    def _score(self, batch):
+        now = time.perf_counter()
+        futures = [future for _, _, future in batch]
+
+        try:
+            results = self.score_batch(np.array([row for row, _, _ in batch], dtype=float))
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+        waits = [now - queued_at for _, queued_at, _ in batch]
+        self._last_batch_size = len(batch)
+        self.total_requests += len(batch)
+        self.total_batches += 1
+        self.batch_sizes[len(batch)] += 1
+        self.total_queue_wait += sum(waits)
+        self.max_queue_wait = max(self.max_queue_wait, max(waits))
+
+    def snapshot(self):
+        """Batch size distribution and queue waits since startup"""
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "total_requests": self.total_requests,
+            "total_batches": self.total_batches,
+            "mean_batch_size": round(self.total_requests / self.total_batches, 2) if self.total_batches else 0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_wait_ms": round(self.total_queue_wait / self.total_requests * 1000, 3) if self.total_requests else 0,
+            "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+        }
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Most (model version, features) results kept, and how long one stays valid
+# in seconds; PREDICT_CACHE_SIZE=0 turns the cache off
+CACHE_MAX_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("PREDICT_CACHE_TTL", "3600"))
+
+
+def normalize_features(features):
+    """Hashable, canonical form of a feature row (1 and 1.0 give the same key)"""
+    return tuple(round(float(x), 6) for x in features)
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of (label, probability) keyed by model version and features
+
+    Entries from a previous model version are never returned because the
+    version is part of the key; clear() drops them eagerly on reload.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_version, features):
+        if self.max_size <= 0:
+            return None
+
+        key = (model_version, normalize_features(features))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, model_version, features, value):
+        if self.max_size <= 0:
+            return
+
+        key = (model_version, normalize_features(features))
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        """Size and hit rate of the cache (GET /predict/cache)"""
+        lookups = self.hits + self.misses
+        return {
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
@@ -1,7 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, text, select, update, func, Index, Column, Integer, Float, String, DateTime, ForeignKey, Text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship, column_property
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from datetime import datetime
+import os
+import unicodedata
+
+from app.profiler import SQL_PROFILE, SQLProfiler
 
 Base = declarative_base()
 
@@ -23,6 +31,9 @@ class PatientProfile(Base):
     # Relationship
     predictions = relationship("PredictionHistory", back_populates="patient")
     
+    # Keyset pagination order
+    __table_args__ = (Index('ix_patient_profiles_created_at_id', 'created_at', 'id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -34,7 +45,7 @@ class PatientProfile(Base):
             'email': self.email,
             'address': self.address,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'total_predictions': len(self.predictions)
+            'total_predictions': self.prediction_count
         }
 
 # Prediction History - Each Checkup
@@ -42,7 +53,7 @@ class PredictionHistory(Base):
     __tablename__ = "prediction_history"
     
     id = Column(Integer, primary_key=True, index=True)
-    profile_id = Column(Integer, ForeignKey('patient_profiles.id'))
+    profile_id = Column(Integer, ForeignKey('patient_profiles.id'), index=True)
     
     # Medical Parameters
     age = Column(Integer)
@@ -62,16 +73,25 @@ class PredictionHistory(Base):
     # Prediction Results
     prediction = Column(String)  # High Risk / Low Risk
     risk_probability = Column(Float)
+    model_version = Column(String, nullable=True)  # Model that produced this score
+    outcome = Column(Integer, nullable=True)  # Confirmed diagnosis (1: heart disease), training label
     
     # Doctor's Notes (Optional)
     doctor_notes = Column(Text, nullable=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship
     patient = relationship("PatientProfile", back_populates="predictions")
     
+    # Keyset pagination order; per-patient timeline (covers its risk aggregates)
+    __table_args__ = (
+        Index('ix_prediction_history_created_at_id', 'created_at', 'id'),
+        Index('ix_prediction_history_timeline', 'profile_id', 'created_at', 'id', 'risk_probability'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -91,17 +111,368 @@ class PredictionHistory(Base):
             'thal': self.thal,
             'prediction': self.prediction,
             'risk_probability': round(self.risk_probability * 100, 2),
+            'model_version': self.model_version,
+            'outcome': self.outcome,
             'doctor_notes': self.doctor_notes,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
 
-# Database setup
-DATABASE_URL = "sqlite:///./heart_disease.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Number of predictions, a correlated COUNT in the profile's SELECT (no lazy load of history).
+# Deferred: queries that return to_dict() undefer it, others (/predict, reports) skip the COUNT.
+PatientProfile.prediction_count = column_property(
+    select(func.count(PredictionHistory.id))
+    .where(PredictionHistory.profile_id == PatientProfile.id)
+    .correlate_except(PredictionHistory)
+    .scalar_subquery(),
+    deferred=True
+)
+
+# Statistics Summary - Dashboard counters (single row, kept in sync on every flush)
+class StatisticsSummary(Base):
+    __tablename__ = "statistics_summary"
+    
+    id = Column(Integer, primary_key=True)  # Always 1
+    total_patients = Column(Integer, nullable=False, default=0)
+    total_predictions = Column(Integer, nullable=False, default=0)
+    high_risk_count = Column(Integer, nullable=False, default=0)
+    low_risk_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+STATISTICS_ROW_ID = 1
+
+# ID Sequence - Primary keys handed out in blocks ahead of the insert (see app/write_behind.py)
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+    
+    name = Column(String, primary_key=True)  # Table name
+    next_id = Column(Integer, nullable=False)  # First id not yet reserved by any process
+
+# Background Job - Report/export generated outside the request (see app/jobs.py)
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)  # report / excel_patients / excel_high_risk / filtered_export
+    params = Column(Text, nullable=True)  # JSON
+    status = Column(String, nullable=False, default="queued", index=True)  # queued / running / completed / failed / expired
+    error = Column(Text, nullable=True)
+    
+    # Artifact (file under JOB_ARTIFACT_DIR, removed once expired)
+    artifact_path = Column(String, nullable=True)
+    artifact_size = Column(Integer, nullable=True)
+    filename = Column(String, nullable=True)
+    media_type = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Renewed by the worker while running
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
+    
+    def to_dict(self):
+        def fmt(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+        
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'error': self.error,
+            'filename': self.filename,
+            'artifact_size': self.artifact_size,
+            'created_at': fmt(self.created_at),
+            'started_at': fmt(self.started_at),
+            'finished_at': fmt(self.finished_at),
+            'expires_at': fmt(self.expires_at),
+            'download_url': f"/jobs/{self.id}/download" if self.status == "completed" else None
+        }
+
+def apply_statistics_delta(conn, patients=0, predictions=0, high_risk=0, low_risk=0):
+    """
+    Increment the summary counters inside the caller's transaction
+    
+    Relative UPDATEs stay correct under concurrent writers. ORM flushes call
+    this automatically; code inserting with Core must call it itself.
+    """
+    if not (patients or predictions):
+        return
+    
+    summary = StatisticsSummary.__table__
+    conn.execute(
+        update(summary)
+        .where(summary.c.id == STATISTICS_ROW_ID)
+        .values(
+            total_patients=summary.c.total_patients + patients,
+            total_predictions=summary.c.total_predictions + predictions,
+            high_risk_count=summary.c.high_risk_count + high_risk,
+            low_risk_count=summary.c.low_risk_count + low_risk,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+def rebuild_statistics(conn):
+    """Recompute the counters from the tables in a single atomic statement"""
+    summary = StatisticsSummary.__table__
+    history = PredictionHistory.__table__
+    
+    if conn.execute(select(summary.c.id).where(summary.c.id == STATISTICS_ROW_ID)).first() is None:
+        conn.execute(summary.insert().values(id=STATISTICS_ROW_ID))
+    
+    def count_predictions(label):
+        return (select(func.count()).select_from(history)
+                .where(history.c.prediction == label).scalar_subquery())
+    
+    conn.execute(
+        update(summary)
+        .where(summary.c.id == STATISTICS_ROW_ID)
+        .values(
+            total_patients=select(func.count()).select_from(PatientProfile.__table__).scalar_subquery(),
+            total_predictions=select(func.count()).select_from(history).scalar_subquery(),
+            high_risk_count=count_predictions("High Risk"),
+            low_risk_count=count_predictions("Low Risk"),
+            updated_at=datetime.utcnow()
+        )
+    )
+
+@event.listens_for(Session, "after_flush")
+def _update_statistics_on_flush(session, flush_context):
+    """Count inserted/deleted profiles and predictions into the summary, same transaction"""
+    patients = predictions = high_risk = low_risk = 0
+    
+    for obj, sign in [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]:
+        if isinstance(obj, PatientProfile):
+            patients += sign
+        elif isinstance(obj, PredictionHistory):
+            predictions += sign
+            if obj.prediction == "High Risk":
+                high_risk += sign
+            elif obj.prediction == "Low Risk":
+                low_risk += sign
+    
+    if patients or predictions:
+        apply_statistics_delta(session.connection(), patients, predictions, high_risk, low_risk)
+
+# Database setup: any SQLAlchemy URL; the async engine uses the matching async driver
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./heart_disease.db")
+if DATABASE_URL.startswith("postgres://"):
+    # Heroku/Render style URLs; SQLAlchemy only accepts "postgresql"
+    DATABASE_URL = "postgresql://" + DATABASE_URL[len("postgres://"):]
+
+# Async drivers used for ASYNC_DATABASE_URL when it is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+# Connection pool (per engine; ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # seconds, -1 = never
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+
+# SQLite pragmas run on every new connection; set one to "" to leave SQLite's default
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # readers no longer block the writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # WAL + NORMAL: no fsync per commit
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),  # negative = KiB (64 MB)
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),  # wait for locks instead of failing
+    "foreign_keys": os.getenv("SQLITE_FOREIGN_KEYS", ""),
+}
+
+
+def async_database_url(url):
+    """Same database as `url`, through the async driver for its backend"""
+    url = make_url(url)
+    if url.get_dialect().is_async:
+        return url.render_as_string(hide_password=False)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))\
+        .render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url, is_async=False):
+    """create_engine() keyword arguments for a URL (pool settings, SQLite threading)"""
+    url = make_url(url)
+    options = {"echo": DB_ECHO}
+
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return options
+        # Explicit pool: SQLAlchemy's SQLite default pool class varies by version and driver
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+    else:
+        options["pool_pre_ping"] = True
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def apply_sqlite_pragmas(sync_engine, pragmas=None):
+    """Run the pragmas on every new DBAPI connection of a SQLite engine"""
+    if sync_engine.dialect.name != "sqlite":
+        return
+    pragmas = {name: value for name, value in (SQLITE_PRAGMAS if pragmas is None else pragmas).items() if value}
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url=DATABASE_URL, pragmas=None):
+    """Sync engine with pool settings and SQLite pragmas (pragmas={} for SQLite defaults)"""
+    db_engine = create_engine(url, **engine_options(url))
+    apply_sqlite_pragmas(db_engine, pragmas)
+    return db_engine
+
+
+def create_async_db_engine(url=ASYNC_DATABASE_URL, pragmas=None):
+    db_engine = create_async_engine(url, **engine_options(url, is_async=True))
+    apply_sqlite_pragmas(db_engine.sync_engine, pragmas)
+    return db_engine
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+# Async engine for endpoints running on the event loop (same database)
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Opt-in SQL profiler (SQL_PROFILE=1): per-request statement log, N+1 and slow query reports.
+# The per-request part also needs SQLProfilerMiddleware on the app.
+if SQL_PROFILE:
+    sql_profiler = SQLProfiler()
+    sql_profiler.install(engine)
+    sql_profiler.install(async_engine.sync_engine)
+
+# Columns added after the first release: (table, column); the DDL type comes from the model
+ADDED_COLUMNS = [
+    ("prediction_history", "model_version"),
+    ("prediction_history", "updated_at"),  # NULL for rows never edited since
+    ("prediction_history", "outcome"),
+    ("jobs", "heartbeat_at"),
+]
+
+# Indexes added after the first release
+ADDED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_prediction_history_profile_id ON prediction_history (profile_id)",
+    "CREATE INDEX IF NOT EXISTS ix_patient_profiles_created_at_id ON patient_profiles (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_prediction_history_created_at_id ON prediction_history (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_prediction_history_timeline ON prediction_history (profile_id, created_at, id, risk_probability)",
+]
+
+def migrate_db(db_engine=engine):
+    """Add columns and indexes that create_all() does not add to existing tables"""
+    inspector = inspect(db_engine)
+    with db_engine.begin() as conn:
+        for table, column in ADDED_COLUMNS:
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column not in existing:
+                ddl_type = Base.metadata.tables[table].c[column].type.compile(dialect=db_engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        for ddl in ADDED_INDEXES:
+            conn.execute(text(ddl))
+
+# Full-text index over patient_profiles (SQLite FTS5, external content kept in sync by triggers).
+# Prefixes of 1-6 characters have their own index entries, so a prefix query
+# never has to merge the doclists of every token it expands to.
+# Bengali vowel signs are combining marks, which unicode61 treats as separators
+# ('রহিম' would be indexed as 'রহ' and 'ম'), so they are declared token characters.
+PROFILE_SEARCH_TABLE = "patient_profiles_fts"
+PROFILE_SEARCH_MAX_PREFIX = 6
+BENGALI_MARKS = "".join(
+    chr(c) for c in range(0x0980, 0x0A00) if unicodedata.category(chr(c)).startswith("M")
+)
+PROFILE_SEARCH_TOKENIZE = f"unicode61 remove_diacritics 2 tokenchars ''{BENGALI_MARKS}''"
+PROFILE_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {PROFILE_SEARCH_TABLE} USING fts5(
+        name, phone, email, patient_id,
+        content='patient_profiles', content_rowid='id',
+        tokenize='{PROFILE_SEARCH_TOKENIZE}', prefix='1 2 3 4 5 6'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_profiles_fts_insert AFTER INSERT ON patient_profiles BEGIN
+        INSERT INTO {PROFILE_SEARCH_TABLE}(rowid, name, phone, email, patient_id)
+        VALUES (new.id, new.name, new.phone, new.email, new.patient_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_profiles_fts_delete AFTER DELETE ON patient_profiles BEGIN
+        INSERT INTO {PROFILE_SEARCH_TABLE}({PROFILE_SEARCH_TABLE}, rowid, name, phone, email, patient_id)
+        VALUES ('delete', old.id, old.name, old.phone, old.email, old.patient_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_profiles_fts_update
+        AFTER UPDATE OF name, phone, email, patient_id ON patient_profiles BEGIN
+        INSERT INTO {PROFILE_SEARCH_TABLE}({PROFILE_SEARCH_TABLE}, rowid, name, phone, email, patient_id)
+        VALUES ('delete', old.id, old.name, old.phone, old.email, old.patient_id);
+        INSERT INTO {PROFILE_SEARCH_TABLE}(rowid, name, phone, email, patient_id)
+        VALUES (new.id, new.name, new.phone, new.email, new.patient_id);
+    END""",
+]
+
+def setup_profile_search(conn):
+    """
+    Create the profile search index and its triggers (SQLite with FTS5 only)
+    
+    Returns False when full-text search is unavailable; search then falls
+    back to prefix LIKE queries. Existing profiles are indexed on creation,
+    and an index built with an older tokenizer is rebuilt.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    
+    existing_sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": PROFILE_SEARCH_TABLE}
+    ).scalar()
+    exists = existing_sql is not None
+    if exists and PROFILE_SEARCH_TOKENIZE not in existing_sql:
+        print("Rebuilding the profile search index for the new tokenizer...")
+        conn.execute(text(f"DROP TABLE {PROFILE_SEARCH_TABLE}"))
+        exists = False
+    
+    try:
+        for ddl in PROFILE_SEARCH_DDL:
+            conn.execute(text(ddl))
+    except OperationalError as e:
+        print(f"Full-text profile search disabled: {e}")
+        return False
+    
+    if not exists:
+        conn.execute(text(f"INSERT INTO {PROFILE_SEARCH_TABLE}({PROFILE_SEARCH_TABLE}) VALUES ('rebuild')"))
+    return True
+
+def init_db(db_engine=engine):
+    Base.metadata.create_all(bind=db_engine)
+    migrate_db(db_engine)
+    
+    with db_engine.begin() as conn:
+        setup_profile_search(conn)
+    
+    # First start (or upgrade): build the statistics row from existing data
+    with db_engine.begin() as conn:
+        summary = StatisticsSummary.__table__
+        if conn.execute(select(summary.c.id).where(summary.c.id == STATISTICS_ROW_ID)).first() is None:
+            rebuild_statistics(conn)
 
 def get_db():
     db = SessionLocal()
@@ -109,3 +480,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def close_db():
+    await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Bounded pools so blocking work never runs on the event loop and cannot take
+# over the worker: threads for blocking I/O, processes for CPU-bound rendering
+# (reportlab holds the GIL, so rendering in threads still stalls the loop)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Created by start_executors() (app startup), or on first use outside the app;
+# shutdown_executor() drops them, so a later start gets fresh pools
+_thread_executor = None
+_process_executor = None
+_executor_lock = threading.Lock()
+
+
+def start_executors():
+    """Create both pools (no-op for a pool that already exists)"""
+    get_thread_executor()
+    get_process_executor()
+
+
+def get_thread_executor():
+    """Thread pool for blocking I/O"""
+    global _thread_executor
+    with _executor_lock:
+        if _thread_executor is None:
+            _thread_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="blocking")
+        return _thread_executor
+
+
+def get_process_executor():
+    """Process pool for CPU-bound work"""
+    global _process_executor
+    with _executor_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        return _process_executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the bounded thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context variables (per-request profiling) into the thread, like asyncio.to_thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_thread_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """Run a picklable CPU-bound function in the bounded process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _thread_executor, _process_executor
+    with _executor_lock:
+        executors = [e for e in (_thread_executor, _process_executor) if e is not None]
+        _thread_executor = _process_executor = None
+    for executor in executors:
+        executor.shutdown(wait=True)
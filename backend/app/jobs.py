@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+
+from app.database import Job, SessionLocal
+
+# JOB_WORKERS jobs run at once and at most JOB_MAX_PENDING wait or run;
+# finished artifacts are kept JOB_ARTIFACT_TTL seconds
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_ARTIFACT_DIR = os.getenv("JOB_ARTIFACT_DIR", "data/jobs")
+JOB_ARTIFACT_TTL = float(os.getenv("JOB_ARTIFACT_TTL", str(24 * 3600)))  # seconds
+JOB_CLEANUP_INTERVAL = float(os.getenv("JOB_CLEANUP_INTERVAL", "600"))  # seconds
+# A running job whose heartbeat is this old belongs to a dead process and is requeued;
+# live workers renew the heartbeat every third of it
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+UNFINISHED_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("completed", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Bounded pool of worker threads running report/export jobs, with state in the jobs table
+
+    A handler is registered per job kind as `handler(db, params, fileobj)`;
+    it writes the artifact to fileobj and returns (filename, media_type).
+
+    Several processes may share the jobs table and artifact directory (uvicorn
+    workers, restarts): a worker claims a job with a conditional UPDATE, so
+    each job runs once. While a job runs, its worker renews the job's
+    heartbeat_at. Queued jobs are picked up on start(); a running job is only
+    requeued once its heartbeat is older than JOB_LEASE_SECONDS, i.e. the
+    process running it has died, however long the job itself takes.
+    Artifacts are deleted JOB_ARTIFACT_TTL seconds after the job finishes,
+    and the job is then marked expired.
+    """
+
+    def __init__(self, session_factory=SessionLocal, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                 artifact_dir=JOB_ARTIFACT_DIR, ttl=JOB_ARTIFACT_TTL, cleanup_interval=JOB_CLEANUP_INTERVAL,
+                 lease=JOB_LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.artifact_dir = artifact_dir
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+        self.lease = lease
+
+        self.handlers = {}
+        self._executor = None
+        self._janitor = None
+        self._heartbeat = None
+        self._stopping = threading.Event()
+        self._workers_done = threading.Event()
+        self._pending = 0
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        self._stopping.clear()
+        self._workers_done.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+        self.requeue_stale_jobs()
+        with self.session_factory() as db:
+            queued = [job_id for (job_id,) in db.query(Job.id).filter(Job.status == "queued")
+                      .order_by(Job.created_at)]
+        for job_id in queued:
+            self._schedule(job_id, force=True)
+
+        self.expire_artifacts()
+        self._janitor = threading.Thread(target=self._cleanup_loop, name="job-janitor", daemon=True)
+        self._janitor.start()
+
+    def stop(self):
+        """Finish running jobs; queued jobs stay queued in the database for the next start"""
+        self._stopping.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._janitor is not None:
+            self._janitor.join()
+            self._janitor = None
+        # Heartbeats continue until the running jobs above have finished
+        self._workers_done.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        # Cancelled futures never reach _run's release
+        with self._lock:
+            self._pending = 0
+
+    def submit(self, kind, params=None):
+        """Persist a new job and queue it; returns the job as a dict"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+
+        self._reserve()
+        try:
+            with self.session_factory() as db:
+                job = Job(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params or {}), status="queued")
+                db.add(job)
+                db.commit()
+                result = job.to_dict()
+        except Exception:
+            self._release()
+            raise
+
+        self._schedule(job.id, reserved=True)
+        return result
+
+    def get(self, job_id):
+        with self.session_factory() as db:
+            return db.get(Job, job_id)
+
+    def _reserve(self, force=False):
+        """Take a pending slot (check and increment under one lock)"""
+        with self._lock:
+            if not force and self._pending >= self.max_pending:
+                raise QueueFull(f"Too many pending jobs ({self.max_pending}); try again later")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _schedule(self, job_id, reserved=False, force=False):
+        if not reserved:
+            self._reserve(force)
+        try:
+            self._executor.submit(self._run, job_id)
+        except Exception:
+            self._release()
+            raise
+
+    def renew_heartbeats(self):
+        """Mark the jobs this process is running as alive"""
+        with self._lock:
+            running = list(self._running)
+        if not running:
+            return
+        with self.session_factory() as db:
+            db.execute(
+                update(Job)
+                .where(Job.id.in_(running), Job.status == "running")
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+
+    def _heartbeat_loop(self):
+        while not self._workers_done.wait(self.lease / 3):
+            try:
+                self.renew_heartbeats()
+            except Exception as e:
+                print(f"Job heartbeat failed: {e}")
+
+    def requeue_stale_jobs(self):
+        """Requeue running jobs whose heartbeat is older than the lease; returns their ids"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lease)
+        # Jobs started before heartbeats were recorded only have started_at
+        last_seen = func.coalesce(Job.heartbeat_at, Job.started_at)
+        requeued = []
+        with self.session_factory() as db:
+            stale = [job_id for (job_id,) in db.query(Job.id).filter(
+                Job.status == "running", last_seen < cutoff
+            )]
+            for job_id in stale:
+                # Conditional, so only one process requeues (and cleans up after) each job
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "running", last_seen < cutoff)
+                    .values(status="queued", started_at=None, heartbeat_at=None)
+                ).rowcount
+                db.commit()
+                if claimed == 1:
+                    requeued.append(job_id)
+                    tmp_path = os.path.join(self.artifact_dir, job_id + ".tmp")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+        if requeued:
+            print(f"Requeued {len(requeued)} job(s) whose worker stopped: {', '.join(requeued)}")
+        return requeued
+
+    def _run(self, job_id):
+        try:
+            with self.session_factory() as db:
+                # Atomic claim: another process may be about to run the same queued job
+                now = datetime.utcnow()
+                claimed = db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(status="running", started_at=now, heartbeat_at=now)
+                ).rowcount
+                db.commit()
+                if claimed != 1:
+                    return
+                with self._lock:
+                    self._running.add(job_id)
+                job = db.get(Job, job_id)
+
+                path = os.path.join(self.artifact_dir, job_id)
+                tmp_path = path + ".tmp"
+                try:
+                    with open(tmp_path, 'wb') as f:
+                        filename, media_type = self.handlers[job.kind](db, json.loads(job.params or "{}"), f)
+                    os.replace(tmp_path, path)
+                except Exception as e:
+                    db.rollback()
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    job.status = "failed"
+                    job.error = str(e)
+                    print(f"Job {job_id} ({job.kind}) failed: {e}")
+                else:
+                    job.status = "completed"
+                    job.artifact_path = path
+                    job.artifact_size = os.path.getsize(path)
+                    job.filename = filename
+                    job.media_type = media_type
+
+                job.finished_at = datetime.utcnow()
+                job.expires_at = job.finished_at + timedelta(seconds=self.ttl)
+                db.commit()
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            self._release()
+
+    def expire_artifacts(self):
+        """Delete artifacts of jobs past expires_at; returns the number of jobs expired"""
+        with self.session_factory() as db:
+            expired = db.query(Job).filter(
+                Job.status.in_(FINISHED_STATUSES),
+                Job.expires_at < datetime.utcnow()
+            ).all()
+            for job in expired:
+                if job.artifact_path and os.path.exists(job.artifact_path):
+                    os.remove(job.artifact_path)
+                job.status = "expired"
+                job.artifact_path = None
+            db.commit()
+            return len(expired)
+
+    def _cleanup_loop(self):
+        while not self._stopping.wait(self.cleanup_interval):
+            try:
+                self.expire_artifacts()
+                for job_id in self.requeue_stale_jobs():
+                    self._schedule(job_id, force=True)
+            except Exception as e:
+                print(f"Job artifact cleanup failed: {e}")
+
+    def snapshot(self):
+        """Worker count, queue depth and job kinds (GET /jobs/queue)"""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "artifact_ttl_seconds": self.ttl,
+            "kinds": sorted(self.handlers),
+        }
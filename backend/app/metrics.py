@@ -0,0 +1,281 @@
+import bisect
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+# Prometheus-style metrics kept in process memory and rendered on GET /metrics
+# (METRICS_ENABLED=0 turns them off). Each uvicorn worker has its own
+# counters; scrape every worker, or run a single worker per container.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+RENDER_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labelvalues, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+
+
+class Histogram:
+    """
+    Observations bucketed by upper bound, per label combination
+
+    Each observation is one bisect and three additions under a lock; bucket
+    counts are made cumulative only when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labelvalues -> [bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labelvalues):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labelvalues)
+
+    def wrap(self, func, *labelvalues):
+        """`func` with every call timed"""
+        def timed(*args, **kwargs):
+            with self.time(*labelvalues):
+                return func(*args, **kwargs)
+        return timed
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labelvalues, (list(counts), total))
+                            for labelvalues, (counts, total) in self._series.items())
+        for labelvalues, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class StageTimer:
+    """Observes the time between consecutive marks, labelled by stage"""
+
+    __slots__ = ("histogram", "last")
+
+    def __init__(self, histogram, start=None):
+        self.histogram = histogram
+        self.last = start if start is not None else time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, stage)
+        self.last = now
+
+
+class MetricsRegistry:
+    """Metrics rendered together, plus numeric snapshot() fields exported as gauges"""
+
+    def __init__(self, prefix="heart_api"):
+        self.prefix = prefix
+        self._metrics = []
+        self._snapshots = {}
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def add_snapshot(self, component, snapshot):
+        """Export the numeric top-level values of `snapshot()` as <prefix>_<component>_<key> gauges"""
+        self._snapshots[component] = snapshot
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+
+        for component, snapshot in self._snapshots.items():
+            try:
+                values = snapshot()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{self.prefix}_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Time from request received to last response byte sent",
+    ("method", "route", "status")
+)
+PREDICT_STAGE_SECONDS = metrics.histogram(
+    "predict_stage_duration_seconds", "Time spent in each stage of POST /predict", ("stage",)
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds", "Duration of SQL statements by kind", ("engine", "operation"),
+    buckets=QUERY_BUCKETS
+)
+DB_QUERY_ERRORS = metrics.counter(
+    "db_query_errors_total", "SQL statements that raised", ("engine", "operation")
+)
+INFERENCE_SECONDS = metrics.histogram(
+    "model_inference_duration_seconds", "Model scoring time per call (one call scores a batch)", ("source",),
+    buckets=QUERY_BUCKETS
+)
+INFERENCE_BATCH_SIZE = metrics.histogram(
+    "model_inference_batch_size", "Rows scored per model call", ("source",), buckets=BATCH_SIZE_BUCKETS
+)
+RENDER_SECONDS = metrics.histogram(
+    "render_duration_seconds", "Time to render a report or export", ("kind",), buckets=RENDER_BUCKETS
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into REQUEST_SECONDS
+
+    Requests are labelled with the route template (/report/{prediction_id}),
+    not the raw path, so the number of series stays bounded. Streaming
+    responses are timed until their last chunk. The start time is left in
+    the scope under "metrics.start" for handlers that time their own stages.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope["metrics.start"] = start
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start, scope["method"],
+                getattr(route, "path", "unmatched"), str(status)
+            )
+
+
+def _operation(statement):
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(sync_engine, name):
+    """Time every statement run on an engine (pass async_engine.sync_engine for async engines)"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics.query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["metrics.query_start"].pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, name, _operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("metrics.query_start") if context.connection else None
+        if starts:
+            starts.pop()
+        DB_QUERY_ERRORS.inc(name, _operation(context.statement or ""))
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from datetime import datetime
+
+from app.artifact import ARTIFACT_FILENAME, export_artifact, save_artifact, load_artifact
+from app.scorer import CompiledScorer
+
+# Registry layout:
+#   models/registry/<version>/model.json            pickle-free artifact (served)
+#   models/registry/<version>/model.pkl, scaler.pkl sklearn objects (tooling only)
+#   models/registry/<version>/metadata.json
+#   models/registry/CURRENT  -> name of the version to serve
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models/registry")
+CURRENT_FILE = "CURRENT"
+
+# Unpickling can run arbitrary code, so versions without model.json (and the
+# pre-registry pickles) are only loaded when MODEL_ALLOW_PICKLE=1 is set explicitly
+MODEL_ALLOW_PICKLE = os.getenv("MODEL_ALLOW_PICKLE", "0") == "1"
+
+# Pre-registry artifacts written by older versions of train_model.py
+LEGACY_MODEL_PATH = "models/model.pkl"
+LEGACY_SCALER_PATH = "models/scaler.pkl"
+
+
+class LoadedModel:
+    """Everything needed to score with one model version, swapped as a unit"""
+
+    def __init__(self, version, scorer, feature_names=None, metadata=None):
+        self.version = version
+        self.scorer = scorer
+        self.feature_names = feature_names
+        self.metadata = metadata or {}
+        self.loaded_at = datetime.utcnow()
+
+    def score_batch(self, features):
+        """Per-row (label, probability, version) for a 2D feature matrix"""
+        labels, probabilities = self.scorer.score_batch(features)
+        return [(int(label), float(probability), self.version)
+                for label, probability in zip(labels, probabilities)]
+
+
+class ModelRegistry:
+    """
+    Directory of versioned model artifacts with an atomically swapped active model
+
+    Readers take `registry.active` once per request and use that object
+    throughout, so a reload never mixes artifacts of two versions.
+    """
+
+    def __init__(self, registry_dir=MODEL_REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self.active = None
+        self._lock = threading.Lock()
+
+    def list_versions(self):
+        if not os.path.isdir(self.registry_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.registry_dir)
+            if os.path.isdir(os.path.join(self.registry_dir, name))
+        )
+
+    def current_file_path(self):
+        return os.path.join(self.registry_dir, CURRENT_FILE)
+
+    def current_version(self):
+        """Version named by CURRENT, else the newest version, else None (legacy artifacts)"""
+        path = self.current_file_path()
+        if os.path.exists(path):
+            with open(path) as f:
+                version = f.read().strip()
+            if version:
+                return version
+
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def is_version(self, version):
+        """True only for the name of a version directory (never a path, '.' or '..')"""
+        if not isinstance(version, str) or version in ("", ".", ".."):
+            return False
+        if "/" in version or "\\" in version:
+            return False
+        return version in self.list_versions()
+
+    def load(self, version=None):
+        """Load a version from disk without activating it"""
+        version = version or self.current_version()
+
+        if version is None:
+            return self._load_pickles(None, LEGACY_MODEL_PATH, LEGACY_SCALER_PATH, {})
+
+        # Versions come from the API and the CURRENT file: only registry entries are loaded
+        if not self.is_version(version):
+            raise FileNotFoundError(f"Model version '{version}' not found in {self.registry_dir}")
+        version_dir = os.path.join(self.registry_dir, version)
+
+        metadata = {}
+        metadata_path = os.path.join(version_dir, "metadata.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+
+        artifact_path = os.path.join(version_dir, ARTIFACT_FILENAME)
+        if os.path.exists(artifact_path):
+            scorer, feature_names, artifact_metadata = load_artifact(artifact_path)
+            return LoadedModel(version, scorer, feature_names, dict(artifact_metadata, **metadata))
+
+        return self._load_pickles(
+            version,
+            os.path.join(version_dir, "model.pkl"),
+            os.path.join(version_dir, "scaler.pkl"),
+            metadata
+        )
+
+    def _load_pickles(self, version, model_path, scaler_path, metadata):
+        """Older artifacts: unpickle the sklearn model and scaler (imports sklearn)"""
+        if not MODEL_ALLOW_PICKLE:
+            raise FileNotFoundError(f"No {ARTIFACT_FILENAME} for model version '{version or 'legacy'}'; "
+                                    "retrain with train_model.py, or set MODEL_ALLOW_PICKLE=1 to load its pickles")
+        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+            raise FileNotFoundError("Model or scaler not found. Please train the model first.")
+        print(f"Loading pickled model {model_path} (no {ARTIFACT_FILENAME}, MODEL_ALLOW_PICKLE=1)")
+
+        with open(model_path, 'rb') as f:
+            model_bytes = f.read()
+        with open(scaler_path, 'rb') as f:
+            scaler_bytes = f.read()
+
+        if version is None:
+            # Legacy artifacts are versioned by content
+            version = "legacy-" + hashlib.sha256(model_bytes + scaler_bytes).hexdigest()[:12]
+
+        model = pickle.loads(model_bytes)
+        scaler = pickle.loads(scaler_bytes)
+        feature_names = getattr(scaler, "feature_names_in_", None)
+
+        return LoadedModel(
+            version,
+            CompiledScorer.from_sklearn(model, scaler),
+            list(feature_names) if feature_names is not None else None,
+            metadata
+        )
+
+    def activate(self, version=None, validate=None):
+        """Load a version and swap it in; the previous model keeps serving until the swap"""
+        with self._lock:
+            loaded = self.load(version)
+            if validate is not None:
+                validate(loaded)
+            self.active = loaded
+            return loaded
+
+    def publish(self, model, scaler, feature_names, metadata=None, version=None, make_current=True):
+        """Write a new version to the registry (used by train_model.py)"""
+        version = version or datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        version_dir = os.path.join(self.registry_dir, version)
+        os.makedirs(version_dir, exist_ok=False)
+
+        metadata = dict(metadata or {}, version=version)
+        save_artifact(
+            os.path.join(version_dir, ARTIFACT_FILENAME),
+            export_artifact(model, scaler, feature_names, metadata)
+        )
+
+        with open(os.path.join(version_dir, "model.pkl"), 'wb') as f:
+            pickle.dump(model, f)
+        with open(os.path.join(version_dir, "scaler.pkl"), 'wb') as f:
+            pickle.dump(scaler, f)
+        with open(os.path.join(version_dir, "metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+        if make_current:
+            self.set_current(version)
+
+        return version
+
+    def set_current(self, version):
+        """Point CURRENT at a version (atomic rename, safe for file watchers)"""
+        tmp_path = self.current_file_path() + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, self.current_file_path())
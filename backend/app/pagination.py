@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Keyset (cursor) pagination on (created_at, id).
+# Cursors are opaque to clients: base64url of the last row's sort key.
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Return (created_at, id); raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(created_at_column, id_column, cursor, descending):
+    """
+    WHERE clause selecting the rows after the cursor in (created_at, id) order
+
+    Written as a row-value comparison: SQLite turns it into an index seek,
+    while the equivalent OR of two comparisons scans the index from the start.
+    """
+    created_at, row_id = decode_cursor(cursor)
+    key = tuple_(created_at_column, id_column)
+    if descending:
+        return key < tuple_(created_at, row_id)
+    return key > tuple_(created_at, row_id)
+
+
+def keyset_order(created_at_column, id_column, descending):
+    if descending:
+        return (created_at_column.desc(), id_column.desc())
+    return (created_at_column.asc(), id_column.asc())
+
+
+def paginate(query, created_at_column, id_column, limit, skip=0, cursor=None, descending=False):
+    """
+    Order a query by (created_at, id) and select one page
+
+    With a cursor the page starts right after it (keyset); otherwise the
+    legacy skip offset is used. One extra row is fetched to detect the end.
+    """
+    query = query.order_by(*keyset_order(created_at_column, id_column, descending))
+    if cursor:
+        query = query.filter(keyset_filter(created_at_column, id_column, cursor, descending))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+
+def split_page(rows, limit, sort_key):
+    """Return (page rows, next_cursor or None); sort_key(row) -> (created_at, id)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*sort_key(rows[-1]))
@@ -0,0 +1,197 @@
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+# SQL profiler for development and staging, off unless SQL_PROFILE=1.
+# Records every statement per request, flags statements repeated with different
+# parameters (N+1), logs slow statements with their query plan and returns a
+# summary in the X-SQL-Profile response header.
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SQL_PROFILE_SLOW_MS = float(os.getenv("SQL_PROFILE_SLOW_MS", "100"))
+# Same statement this many times in one request = N+1
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+
+PROFILE_HEADER = "X-SQL-Profile"
+N_PLUS_ONE_HEADER = "X-SQL-Profile-N-Plus-One"
+EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+EXPLAINED_STATEMENTS_MAX = 500
+
+_current_profile = contextvars.ContextVar("sql_profile", default=None)
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement):
+    """Statement text with literals and IN lists collapsed, so only the shape is compared"""
+    text = _SPACE.sub(" ", statement.strip())
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    return _IN_LIST.sub("(?...)", text)
+
+
+def _shorten(text, length=160):
+    return text if len(text) <= length else text[:length - 3] + "..."
+
+
+class RequestProfile:
+    """Statements executed while handling one request"""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.statements = []  # (fingerprint, duration in seconds)
+        self._lock = threading.Lock()
+
+    def record(self, statement, duration):
+        with self._lock:
+            self.statements.append((fingerprint(statement), duration))
+
+    def repeated(self, threshold=SQL_PROFILE_REPEAT_THRESHOLD):
+        """[(fingerprint, count, total seconds)] for statements run at least `threshold` times, worst first"""
+        groups = {}
+        with self._lock:
+            for shape, duration in self.statements:
+                count, total = groups.get(shape, (0, 0.0))
+                groups[shape] = (count + 1, total + duration)
+        flagged = [(shape, count, total) for shape, (count, total) in groups.items() if count >= threshold]
+        return sorted(flagged, key=lambda item: (-item[1], -item[2]))
+
+    def summary(self):
+        with self._lock:
+            durations = [duration for _, duration in self.statements]
+        return {
+            "queries": len(durations),
+            "total_ms": round(sum(durations) * 1000, 2),
+            "slowest_ms": round(max(durations) * 1000, 2) if durations else 0,
+            "n_plus_one": len(self.repeated()),
+        }
+
+    def header_value(self):
+        return ";".join(f"{key}={value}" for key, value in self.summary().items())
+
+
+class SQLProfiler:
+    """Engine event hooks: per-request statement log, slow statements with their plan"""
+
+    def __init__(self, slow_ms=SQL_PROFILE_SLOW_MS):
+        self.slow = slow_ms / 1000.0
+        self._explained = OrderedDict()  # fingerprints whose plan was already logged
+        self._lock = threading.Lock()
+
+    def install(self, sync_engine):
+        """Attach to an engine (pass async_engine.sync_engine for async engines)"""
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+        event.listen(sync_engine, "handle_error", self._error)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler.query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("profiler.query_start")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, duration)
+
+        if duration >= self.slow:
+            self._log_slow(conn, statement, parameters, executemany, duration)
+
+    def _error(self, context):
+        starts = context.connection.info.get("profiler.query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+    def _log_slow(self, conn, statement, parameters, executemany, duration):
+        profile = _current_profile.get()
+        where = f" in {profile.method} {profile.path}" if profile else ""
+        print(f"Slow query ({duration * 1000:.1f} ms){where}: {_shorten(_SPACE.sub(' ', statement), 500)}")
+
+        shape = fingerprint(statement)
+        with self._lock:
+            if shape in self._explained:
+                return
+            self._explained[shape] = True
+            if len(self._explained) > EXPLAINED_STATEMENTS_MAX:
+                self._explained.popitem(last=False)
+
+        plan = self.explain(conn, statement, parameters[0] if executemany and parameters else parameters)
+        if plan:
+            print("  query plan:\n" + "\n".join(f"    {line}" for line in plan))
+
+    @staticmethod
+    def explain(conn, statement, parameters):
+        """Plan lines for a statement, using the connection it ran on (None if not supported)"""
+        prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+            return None
+        try:
+            # Raw DBAPI cursor: bypasses the engine events, so the EXPLAIN is not profiled itself
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters or ())
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            return [f"(EXPLAIN failed: {e})"]
+        if conn.dialect.name == "sqlite":
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+
+class SQLProfilerMiddleware:
+    """
+    ASGI middleware giving each HTTP request its own RequestProfile
+
+    The summary goes into the X-SQL-Profile header (queries, total and
+    slowest time, number of N+1 shapes) and the worst N+1 statement into
+    X-SQL-Profile-N-Plus-One. For streamed responses the header only covers
+    statements run before the first byte; the log line printed at the end
+    of the request covers all of them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_HEADER.lower().encode(), profile.header_value().encode()))
+                repeated = profile.repeated()
+                if repeated:
+                    shape, count, _ = repeated[0]
+                    value = f"{count}x {_shorten(shape, 300)}".encode("latin-1", "replace")
+                    headers.append((N_PLUS_ONE_HEADER.lower().encode(), value))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            for shape, count, total in profile.repeated():
+                print(f"N+1 in {profile.method} {profile.path}: {count} x ({total * 1000:.1f} ms) "
+                      f"{_shorten(shape)}")
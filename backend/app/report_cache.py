@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Rendered PDFs live in REPORT_CACHE_DIR; the least recently served are
+# deleted once the directory grows past REPORT_CACHE_MAX_MB
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "data/report_cache")
+REPORT_CACHE_MAX_BYTES = int(float(os.getenv("REPORT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def report_cache_key(prediction_id, updated_at, profile_updated_at, template_version):
+    """
+    Content address of a rendered report
+
+    A prediction's report only changes when the prediction or its profile is
+    edited, or when the template changes, so those inputs name the PDF.
+    """
+    parts = [template_version, prediction_id, updated_at, profile_updated_at]
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class ReportCache:
+    """
+    Directory of rendered PDFs named by content key, bounded by total size (LRU)
+
+    Files already on disk are adopted at startup, oldest access first, so the
+    cache survives restarts. Writes go to a temp file and are renamed into
+    place, so a reader never sees a partial PDF.
+    """
+
+    def __init__(self, directory=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.max_bytes > 0:
+            os.makedirs(self.directory, exist_ok=True)
+            self._adopt_existing()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pdf")
+
+    def _adopt_existing(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pdf"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def get(self, key):
+        """Cached PDF bytes, or None"""
+        if self.max_bytes <= 0:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))  # Keeps LRU order across restarts
+        except FileNotFoundError:
+            # Removed behind our back (e.g. another worker evicted it)
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._size += len(data) - self._entries.get(key, 0)
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self):
+        """Disk usage, hits and evictions (GET /report/cache)"""
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "size_bytes": self._size,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
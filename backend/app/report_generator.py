@@ -4,9 +4,60 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-from datetime import datetime
+from functools import lru_cache
 import io
 
+# Bump whenever the report layout or wording changes: cached PDFs rendered
+# with an older template are then never served again
+REPORT_TEMPLATE_VERSION = "2"
+
+
+@lru_cache(maxsize=1)
+def get_report_styles():
+    """Paragraph styles for the report, built once per process"""
+    styles = getSampleStyleSheet()
+    
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold'
+        ),
+        'normal': ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=11,
+            spaceAfter=6,
+            alignment=TA_LEFT
+        ),
+        'disclaimer': ParagraphStyle(
+            'Disclaimer',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.HexColor('#6b7280'),
+            alignment=TA_JUSTIFY,
+            spaceBefore=12,
+            borderColor=colors.HexColor('#d1d5db'),
+            borderWidth=1,
+            borderPadding=10,
+            backColor=colors.HexColor('#f9fafb')
+        ),
+    }
+
+
 def generate_patient_report(patient_data):
     """Generate a PDF report for a patient"""
     
@@ -18,44 +69,19 @@ def generate_patient_report(patient_data):
     # Container for the 'Flowable' objects
     elements = []
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=12,
-        spaceBefore=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=6,
-        alignment=TA_LEFT
-    )
+    styles = get_report_styles()
+    title_style = styles['title']
+    heading_style = styles['heading']
+    normal_style = styles['normal']
     
     # Title
     title = Paragraph("Heart Disease Prediction Report", title_style)
     elements.append(title)
     elements.append(Spacer(1, 0.2*inch))
     
-    # Report metadata
-    report_date = datetime.now().strftime('%B %d, %Y at %I:%M %p')
-    date_text = Paragraph(f"<b>Report Generated:</b> {report_date}", normal_style)
+    # Report metadata (the last change to the prediction or profile; reports are cached)
+    report_date = patient_data['report_date'].strftime('%B %d, %Y at %I:%M %p')
+    date_text = Paragraph(f"<b>Report Date:</b> {report_date}", normal_style)
     elements.append(date_text)
     elements.append(Spacer(1, 0.3*inch))
     
@@ -186,18 +212,7 @@ def generate_patient_report(patient_data):
     elements.append(Spacer(1, 0.3*inch))
     
     # Disclaimer
-    disclaimer_style = ParagraphStyle(
-        'Disclaimer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#6b7280'),
-        alignment=TA_JUSTIFY,
-        spaceBefore=12,
-        borderColor=colors.HexColor('#d1d5db'),
-        borderWidth=1,
-        borderPadding=10,
-        backColor=colors.HexColor('#f9fafb')
-    )
+    disclaimer_style = styles['disclaimer']
     
     disclaimer_text = """
     <b>DISCLAIMER:</b> This prediction is generated by a machine learning model and should be used 
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 
 # Patient Profile Schemas
 class PatientProfileCreate(BaseModel):
@@ -59,6 +59,25 @@ class PredictionResponse(BaseModel):
     message: str
     recommendations: List[str]
     is_new_patient: bool
+    model_version: Optional[str] = None
+
+# Batch Prediction (Screening Camps)
+class BatchPredictionInput(BaseModel):
+    records: List[PredictionInput] = Field(..., min_length=1, max_length=1000)
+
+class BatchPredictionItem(BaseModel):
+    index: int  # Position of the record in the submitted batch
+    result: Optional[PredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchPredictionItem]
+
+class PredictionOutcome(BaseModel):
+    outcome: int = Field(..., ge=0, le=1)  # Confirmed diagnosis: 1 = heart disease, 0 = none
 
 class PredictionHistoryResponse(BaseModel):
     id: int
@@ -68,11 +87,23 @@ class PredictionHistoryResponse(BaseModel):
     risk_probability: float
     created_at: str
     doctor_notes: Optional[str]
+    model_version: Optional[str] = None
+
+class TimelineSummary(BaseModel):
+    # Over the whole requested window, not just the returned page (risk in %)
+    count: int
+    min_risk: Optional[float] = None
+    max_risk: Optional[float] = None
+    mean_risk: Optional[float] = None
+    risk_slope_per_30_days: Optional[float] = None  # Least-squares trend, percentage points
+    first_checkup: Optional[str] = None
+    last_checkup: Optional[str] = None
 
 class PatientTimelineResponse(BaseModel):
     profile: PatientProfileResponse
     history: List[PredictionHistoryResponse]
     risk_trend: str  # "improving", "stable", "worsening"
+    summary: Optional[TimelineSummary] = None
     
 class StatsResponse(BaseModel):
     total_patients: int
@@ -81,3 +112,28 @@ class StatsResponse(BaseModel):
     low_risk_count: int
     high_risk_percentage: float
     low_risk_percentage: float
+
+# Filtered Export / Bulk Reports
+class PredictionFilters(BaseModel):
+    date_from: Optional[date] = None  # Inclusive
+    date_to: Optional[date] = None  # Inclusive (whole day)
+    risk_level: Optional[str] = Field(None, pattern=r'^(High Risk|Low Risk)$')
+    min_risk_probability: Optional[float] = Field(None, ge=0, le=100)  # Percent, as in API responses
+    max_risk_probability: Optional[float] = Field(None, ge=0, le=100)
+    age_min: Optional[int] = Field(None, ge=1, le=120)
+    age_max: Optional[int] = Field(None, ge=1, le=120)
+    patient_ids: Optional[List[str]] = Field(None, max_length=1000)
+
+class ExportFilters(PredictionFilters):
+    format: str = Field("csv", pattern=r'^(csv|parquet)$')
+
+class BulkReportRequest(BaseModel):
+    # Either explicit predictions or a filter selecting them
+    prediction_ids: Optional[List[int]] = Field(None, min_length=1, max_length=5000)
+    filters: Optional[PredictionFilters] = None
+
+# Background Jobs
+class JobCreate(BaseModel):
+    kind: str = Field(..., pattern=r'^(report|excel_patients|excel_high_risk|filtered_export)$')
+    prediction_id: Optional[int] = None  # kind=report
+    filters: Optional[ExportFilters] = None  # kind=filtered_export
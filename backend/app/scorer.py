@@ -0,0 +1,58 @@
+import math
+import numpy as np
+
+
+class CompiledScorer:
+    """
+    Single-pass scorer for a StandardScaler + LogisticRegression pipeline
+
+    The scaler mean/scale are folded into the model coefficients, so
+    scoring a checkup is one dot product plus a sigmoid:
+
+        z = w . x + b    with  w = coef / scale,  b = intercept - sum(coef * mean / scale)
+    """
+
+    def __init__(self, weights, bias, threshold=0.5):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.threshold = threshold
+        self._weights_list = self.weights.tolist()
+
+    @classmethod
+    def from_coefficients(cls, coef, intercept, mean=None, scale=None):
+        """Build a scorer from LR coefficients on standardized features and the scaler stats"""
+        coef = np.asarray(coef, dtype=np.float64).ravel()
+        mean = np.zeros_like(coef) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones_like(coef) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        weights = coef / scale
+        bias = float(intercept) - float(np.dot(coef, mean / scale))
+        return cls(weights, bias)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler):
+        """Build a scorer from a fitted StandardScaler and binary LogisticRegression"""
+        intercept = float(np.asarray(model.intercept_, dtype=np.float64).ravel()[0])
+        return cls.from_coefficients(model.coef_, intercept, scaler.mean_, scaler.scale_)
+
+    def score(self, features):
+        """Return (label, probability of class 1) for one feature row"""
+        z = self.bias
+        for w, x in zip(self._weights_list, features):
+            z += w * x
+
+        # Numerically stable sigmoid
+        if z >= 0:
+            probability = 1.0 / (1.0 + math.exp(-z))
+        else:
+            e = math.exp(z)
+            probability = e / (1.0 + e)
+
+        return int(probability > self.threshold), probability
+
+    def score_batch(self, features):
+        """Return (labels, probabilities) for a 2D feature matrix"""
+        z = np.asarray(features, dtype=np.float64) @ self.weights + self.bias
+        probabilities = 0.5 * (1.0 + np.tanh(0.5 * z))
+        labels = (probabilities > self.threshold).astype(int)
+        return labels, probabilities
@@ -0,0 +1,182 @@
+import os
+import re
+
+from sqlalchemy import Integer, and_, func, or_, select, text
+from sqlalchemy.orm import undefer
+
+from app.database import PatientProfile, PROFILE_SEARCH_MAX_PREFIX, PROFILE_SEARCH_TABLE
+
+# Matches considered per query. Ranking only looks at these, so a very short
+# prefix on a large table (e.g. "a") is ranked among the first
+# SEARCH_MAX_CANDIDATES matches instead of all of them.
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "200"))
+SEARCH_MAX_TERMS = 8
+# Rows of the indexed-prefix match checked against terms longer than the index
+# (at most this many profile lookups; past it the full prefixes are matched instead)
+SEARCH_MAX_SCAN = 1000
+
+# Word characters besides \w: combining diacritics and the Bengali block, whose
+# vowel signs are combining marks (\w alone splits 'রহিম' into 'রহ' and 'ম')
+WORD_EXTRA_CHARACTERS = "\u0300-\u036f\u0980-\u09ff"
+WORD_PATTERN = re.compile(f"[\\w{WORD_EXTRA_CHARACTERS}]+")
+# The same, as a GLOB character class: ASCII and Latin letters, digits and the ranges above
+GLOB_WORD_CHARACTERS = f"a-z0-9\u00c0-\u024f{WORD_EXTRA_CHARACTERS}"
+
+_fts_available = {}
+
+
+def search_terms(query):
+    """Lowercased word tokens of the user's input (punctuation and FTS syntax dropped)"""
+    return WORD_PATTERN.findall(query.lower())[:SEARCH_MAX_TERMS]
+
+
+def fts_match_expression(terms, prefix=True, indexed=False):
+    """
+    Every term required, as a quoted prefix: 'rah kar' -> '"rah"* "kar"*'
+
+    Prefixes of up to PROFILE_SEARCH_MAX_PREFIX characters are a single
+    prefix index lookup. Longer ones make FTS5 merge the doclists of every
+    token they expand to: cheap for specific input (a phone number, a
+    patient ID), tens of milliseconds at a million profiles for the start
+    of a very common word. indexed=True cuts them to the indexed length,
+    which also matches near misses (the caller checks the full terms).
+    With prefix=False the terms must be whole words, which is also a
+    single lookup each.
+    """
+    if not prefix:
+        return " ".join(f'"{term}"' for term in terms)
+    if indexed:
+        return " ".join(f'"{term[:PROFILE_SEARCH_MAX_PREFIX]}"*' for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def token_prefix_condition(term, columns):
+    """
+    SQL that is true when `term` starts a word of one of `columns`
+
+    Word boundaries are approximated as in the profile search tokenizer: the
+    start of the value or any character outside GLOB_WORD_CHARACTERS. Letters
+    of scripts other than Latin and Bengali also count as boundaries, so
+    there a term may match inside a word. search_terms() only returns word
+    characters, so the term is safe to inline in the GLOB patterns.
+    """
+    return "(" + " OR ".join(
+        f"lower({column}) GLOB '{term}*' OR lower({column}) GLOB '*[^{GLOB_WORD_CHARACTERS}]{term}*'"
+        for column in columns
+    ) + ")"
+
+
+def profile_search_available(conn):
+    """Whether the FTS5 index exists in this database (checked once per engine)"""
+    key = str(conn.engine.url)
+    if key not in _fts_available:
+        _fts_available[key] = conn.dialect.name == "sqlite" and conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": PROFILE_SEARCH_TABLE}
+        ).first() is not None
+    return _fts_available[key]
+
+
+def exact_match(query):
+    """1 when the input is a profile's full patient ID, phone or email (ranks it first)"""
+    value = query.strip().lower()
+    return or_(
+        func.lower(PatientProfile.patient_id) == value,
+        PatientProfile.phone == value,
+        func.lower(PatientProfile.email) == value,
+    )
+
+
+def fts_search_query(terms, limit, query=None):
+    """
+    Profiles matching every term by prefix, ranked by:
+
+    - the input being the full patient ID, phone or email
+    - every term being a whole word
+    - the number of terms found in the name, then name
+
+    bm25 is not used: it counts every document containing each term, which
+    takes tens of milliseconds for common terms at a million profiles. The
+    name hits come from highlight() on the candidate rows only.
+
+    Prefix matches are only looked up when the whole-word matches do not
+    already fill the candidates (they would rank below them anyway). Terms
+    longer than the indexed prefixes are first checked in full against the
+    first SEARCH_MAX_SCAN indexed-prefix matches, which is fast while true
+    matches are common (a half-typed common surname); only when that does
+    not fill the candidates are the full prefixes matched, which is then
+    cheap because few tokens start with them.
+    """
+    name_hits = (f"length(highlight({PROFILE_SEARCH_TABLE}, 0, char(1), '')) - "
+                 f"length(replace(highlight({PROFILE_SEARCH_TABLE}, 0, char(1), ''), char(1), ''))")
+    matches = (f"SELECT rowid AS id, {{whole}} AS whole, {name_hits} AS name_hits FROM {PROFILE_SEARCH_TABLE} "
+               f"WHERE {PROFILE_SEARCH_TABLE} MATCH {{match}} LIMIT :candidates")
+    # CTEs used twice (branch and count) are materialized, so each lookup runs once
+    ctes = {"words": matches.format(whole=1, match=":words")}
+
+    long_terms = [term for term in terms if len(term) > PROFILE_SEARCH_MAX_PREFIX]
+    if long_terms:
+        profiles = PatientProfile.__tablename__
+        columns = [f"{profiles}.{column}" for column in ("name", "phone", "email", "patient_id")]
+        ctes["scanned"] = (
+            f"SELECT {profiles}.id AS id, 0 AS whole, "
+            + " + ".join(token_prefix_condition(term, [f"{profiles}.name"]) for term in terms)
+            + f" AS name_hits FROM (SELECT rowid FROM {PROFILE_SEARCH_TABLE} "
+            f"WHERE {PROFILE_SEARCH_TABLE} MATCH :indexed LIMIT :scan) AS scan "
+            f"JOIN {profiles} ON {profiles}.id = scan.rowid WHERE "
+            + " AND ".join(token_prefix_condition(term, columns) for term in long_terms)
+            + " LIMIT :candidates"
+        )
+
+    # An empty phrase ('""') matches nothing without touching the index
+    found = " + ".join(f"(SELECT count(*) FROM {name})" for name in ctes)
+    prefixes = matches.format(whole=0, match=f"""CASE WHEN {found} < :candidates THEN :prefixes ELSE '""' END""")
+    candidates = text(
+        "WITH " + ", ".join(f"{name} AS ({cte})" for name, cte in ctes.items())
+        + " SELECT id, max(whole) AS whole, max(coalesce(name_hits, 0)) AS name_hits FROM ("
+        + " UNION ALL ".join([f"SELECT * FROM {name}" for name in ctes] + [f"SELECT * FROM ({prefixes})"])
+        + ") GROUP BY id"
+    ).bindparams(
+        words=fts_match_expression(terms, prefix=False), prefixes=fts_match_expression(terms),
+        candidates=SEARCH_MAX_CANDIDATES
+    )
+    if long_terms:
+        candidates = candidates.bindparams(
+            indexed=fts_match_expression(terms, indexed=True), scan=SEARCH_MAX_SCAN
+        )
+    candidates = candidates.columns(id=Integer, whole=Integer, name_hits=Integer).subquery()
+
+    order = [candidates.c.whole.desc(), candidates.c.name_hits.desc(), PatientProfile.name, PatientProfile.id]
+    if query is not None:
+        order.insert(0, exact_match(query).desc())
+    return (
+        select(PatientProfile)
+        .join(candidates, candidates.c.id == PatientProfile.id)
+        .order_by(*order)
+        .limit(limit)
+    )
+
+
+def like_search_query(terms, limit):
+    """Fallback without FTS5: every term must prefix one of the searchable columns"""
+    columns = [PatientProfile.name, PatientProfile.phone, PatientProfile.email, PatientProfile.patient_id]
+    conditions = []
+    for term in terms:
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(or_(*(
+            or_(col.ilike(f"{escaped}%", escape="\\"), col.ilike(f"% {escaped}%", escape="\\"))
+            for col in columns
+        )))
+    return select(PatientProfile).where(and_(*conditions)).order_by(PatientProfile.name).limit(limit)
+
+
+def search_profiles(db, query, limit):
+    """Ranked profiles for search-as-you-type over name, phone, email and patient ID"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if profile_search_available(db.connection()):
+        statement = fts_search_query(terms, limit, query)
+    else:
+        statement = like_search_query(terms, limit)
+    return db.execute(statement.options(undefer(PatientProfile.prediction_count))).scalars().all()
@@ -0,0 +1,43 @@
+"""
+Dashboard statistics maintenance
+
+The counters in statistics_summary are updated in the same transaction as
+every ORM insert/delete (see app.database). Use this command to reconcile
+them after bulk loads or manual edits:
+
+    python -m app.statistics rebuild
+    python -m app.statistics show
+"""
+import sys
+
+from sqlalchemy import select
+
+from app.database import engine, init_db, rebuild_statistics, StatisticsSummary, STATISTICS_ROW_ID
+
+
+def read_statistics(conn):
+    summary = StatisticsSummary.__table__
+    return conn.execute(select(summary).where(summary.c.id == STATISTICS_ROW_ID)).mappings().first()
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "show"
+    if command not in ("rebuild", "show"):
+        print(__doc__)
+        return 1
+
+    init_db()
+    with engine.begin() as conn:
+        before = read_statistics(conn)
+        if command == "rebuild":
+            rebuild_statistics(conn)
+        after = read_statistics(conn)
+
+    for key in ("total_patients", "total_predictions", "high_risk_count", "low_risk_count"):
+        change = f"  (was {before[key]})" if before[key] != after[key] else ""
+        print(f"{key:<18} {after[key]}{change}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
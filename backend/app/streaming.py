@@ -0,0 +1,108 @@
+import contextvars
+import queue
+import threading
+
+from app.database import SessionLocal
+
+# Bytes handed to the HTTP response per chunk, and chunks buffered ahead of the client
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_QUEUE_SIZE = 16
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Unseekable file object that hands written bytes to the response in chunks"""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= STREAM_CHUNK_SIZE:
+            self._put(bytes(self.buffer[:STREAM_CHUNK_SIZE]))
+            del self.buffer[:STREAM_CHUNK_SIZE]
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+        if self.buffer:
+            self._put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def _put(self, chunk):
+        # Bounded queue: block while the client is slower than the export
+        while True:
+            if self.cancelled.is_set():
+                raise ExportCancelled()
+            try:
+                self.chunks.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+_DONE = object()
+
+
+def stream_output(write_output, session_factory=SessionLocal):
+    """
+    Generator of file bytes for StreamingResponse
+
+    `write_output(db, fileobj)` runs in a background thread with its own
+    session; bytes are yielded as the file is written, with a bounded
+    buffer in between. Used by the Excel and filtered CSV/Parquet exports.
+    """
+    chunks = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+
+    def produce():
+        writer = _QueueWriter(chunks, cancelled)
+        db = session_factory()
+        try:
+            try:
+                write_output(db, writer)
+                writer.close()
+                writer._put(_DONE)
+            except ExportCancelled:
+                raise
+            except Exception as e:
+                writer._put(e)
+        except ExportCancelled:
+            pass
+        finally:
+            db.close()
+
+    # Runs in the caller's context so per-request hooks (SQL profiler) see its queries
+    producer = threading.Thread(target=contextvars.copy_context().run, args=(produce,),
+                                name="export-writer", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Client went away (or we finished): stop the producer
+        cancelled.set()
+        producer.join()
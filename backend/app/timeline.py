@@ -0,0 +1,91 @@
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import select, func
+
+from app.database import PredictionHistory
+
+# Timeline statistics are aggregated in SQL over the requested window, so the
+# cost of a request depends on the page size, not on the length of the history.
+
+
+def window_conditions(profile_id, date_from=None, date_to=None):
+    """WHERE clauses for one patient's predictions in an inclusive date range"""
+    conditions = [PredictionHistory.profile_id == profile_id]
+    if date_from:
+        conditions.append(PredictionHistory.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        conditions.append(PredictionHistory.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return conditions
+
+
+def days_since(column, reference: datetime, dialect_name):
+    """SQL expression: days between reference and a timestamp column (fractional)"""
+    if dialect_name == "sqlite":
+        return func.julianday(column) - func.julianday(reference.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    return (func.extract('epoch', column) - reference.timestamp()) / 86400.0
+
+
+def summary_query(conditions, reference: datetime, dialect_name):
+    """
+    One aggregate row: count, min/max/mean risk and the sums for a least-squares slope
+
+    Days are measured from `reference` (the profile's creation) rather than an
+    absolute epoch, which keeps the sums small enough for the slope formula to
+    stay accurate in floating point.
+    """
+    x = days_since(PredictionHistory.created_at, reference, dialect_name)
+    y = PredictionHistory.risk_probability
+    return select(
+        func.count(PredictionHistory.id).label("count"),
+        func.min(y).label("min_risk"),
+        func.max(y).label("max_risk"),
+        func.avg(y).label("mean_risk"),
+        func.sum(x).label("sum_x"),
+        func.sum(x * x).label("sum_xx"),
+        func.sum(x * y).label("sum_xy"),
+        func.sum(y).label("sum_y"),
+        func.min(PredictionHistory.created_at).label("first_checkup"),
+        func.max(PredictionHistory.created_at).label("last_checkup"),
+    ).where(*conditions)
+
+
+def summarize(row):
+    """TimelineSummary fields from a summary_query row (risk in percent, as in the API)"""
+    count = row.count or 0
+
+    slope = None
+    if count >= 2:
+        denominator = count * row.sum_xx - row.sum_x * row.sum_x
+        if denominator > 1e-12:
+            per_day = (count * row.sum_xy - row.sum_x * row.sum_y) / denominator
+            slope = round(per_day * 30 * 100, 4)
+
+    def percent(value):
+        return round(value * 100, 2) if value is not None else None
+
+    def fmt(value):
+        if value is None:
+            return None
+        if isinstance(value, str):  # Aggregates of DateTime come back as text on SQLite
+            value = datetime.fromisoformat(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    return {
+        "count": count,
+        "min_risk": percent(row.min_risk),
+        "max_risk": percent(row.max_risk),
+        "mean_risk": percent(row.mean_risk),
+        "risk_slope_per_30_days": slope,
+        "first_checkup": fmt(row.first_checkup),
+        "last_checkup": fmt(row.last_checkup),
+    }
+
+
+def risk_trend(recent_risks):
+    """Compare the latest checkup with the third latest (newest first)"""
+    if len(recent_risks) >= 2:
+        if recent_risks[0] < recent_risks[-1]:
+            return "improving"
+        if recent_risks[0] > recent_risks[-1]:
+            return "worsening"
+    return "stable"
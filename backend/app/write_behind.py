@@ -0,0 +1,297 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database import IdSequence, PredictionHistory, apply_statistics_delta, engine as default_engine
+from app.executor import run_blocking
+
+# How /predict stores PredictionHistory rows:
+#   sync  - insert and commit inside the request (default)
+#   group - queue the row and respond once the group commit holding it is done;
+#           concurrent requests share one transaction (and one fsync)
+#   async - queue the row and respond at once (write-behind); rows still queued
+#           are lost if the process crashes, and appear in reads within about
+#           WRITE_BEHIND_FLUSH_MS
+PREDICTION_WRITE_MODE = os.getenv("PREDICTION_WRITE_MODE", "sync")
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "20"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "256"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))  # submit waits when full
+WRITE_BEHIND_RETRIES = int(os.getenv("WRITE_BEHIND_RETRIES", "3"))
+# Rows that still fail after the retries (async mode) are appended here instead of being dropped
+WRITE_BEHIND_DEAD_LETTER = os.getenv("WRITE_BEHIND_DEAD_LETTER", "data/write_behind_failed.jsonl")
+
+# Ids reserved from id_sequences per round trip
+PREDICTION_ID_BLOCK_SIZE = int(os.getenv("PREDICTION_ID_BLOCK_SIZE", "100"))
+
+WRITE_MODES = ("sync", "group", "async")
+
+
+def insert_if_missing(conn, table):
+    """INSERT that leaves an existing row with the same key alone (ON CONFLICT DO NOTHING)"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql_insert(table).on_conflict_do_nothing()
+    if dialect in ("mysql", "mariadb"):
+        return insert(table).prefix_with("IGNORE")
+    raise NotImplementedError(f"No INSERT ... ON CONFLICT DO NOTHING for {dialect}")
+
+
+class IdAllocator:
+    """
+    Hands out primary keys before the row is written, reserving blocks in id_sequences
+
+    Every process reserves its own blocks, so ids never collide across
+    workers. Ids of a block left unused at shutdown are skipped (gaps are
+    harmless). An autoincrement insert could take an id inside another
+    process's block, so every insert into the table takes its id from an
+    allocator: the API does in every PREDICTION_WRITE_MODE, and so does
+    generate_data.py.
+    """
+
+    def __init__(self, table=PredictionHistory.__table__, db_engine=default_engine,
+                 block_size=PREDICTION_ID_BLOCK_SIZE):
+        self.table = table
+        self.engine = db_engine
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        """
+        Create the sequence row, and move it past ids inserted without the allocator
+
+        Safe when several processes start at once: the row is created with an
+        insert that ignores an existing row, and only ever moved forward.
+        """
+        sequences = IdSequence.__table__
+        with self.engine.begin() as conn:
+            floor = conn.execute(select(func.coalesce(func.max(self.table.c.id), 0) + 1)).scalar()
+            conn.execute(insert_if_missing(conn, sequences).values(name=self.table.name, next_id=floor))
+            conn.execute(
+                update(sequences)
+                .where(sequences.c.name == self.table.name, sequences.c.next_id < floor)
+                .values(next_id=floor)
+            )
+
+    def _reserve(self, count):
+        """Reserve `count` consecutive ids; returns the first"""
+        sequences = IdSequence.__table__
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(sequences)
+                .where(sequences.c.name == self.table.name)
+                .values(next_id=sequences.c.next_id + count)
+            )
+            end = conn.execute(
+                select(sequences.c.next_id).where(sequences.c.name == self.table.name)
+            ).scalar()
+        return end - count
+
+    @property
+    def needs_refill(self):
+        return self._next >= self._end
+
+    async def allocate(self):
+        """next_id() from the event loop (a block refill runs in the thread pool)"""
+        if self.needs_refill:
+            return await run_blocking(self.next_id)
+        return self.next_id()
+
+    def next_id(self):
+        """One id (reserves a new block when the current one is used up; blocking)"""
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve(self.block_size)
+                self._end = self._next + self.block_size
+            self._next += 1
+            return self._next - 1
+
+    def take(self, count):
+        """`count` ids for a bulk insert (reserved as their own block)"""
+        if count <= 0:
+            return []
+        first = self._reserve(count)
+        return list(range(first, first + count))
+
+
+def prediction_row(record: PredictionHistory):
+    """Column values of a transient PredictionHistory, with the timestamps filled in"""
+    row = {column.key: getattr(record, column.key) for column in PredictionHistory.__table__.columns}
+    now = datetime.utcnow()
+    row["created_at"] = row["created_at"] or now
+    row["updated_at"] = row["updated_at"] or now
+    return row
+
+
+class PredictionWriter:
+    """
+    Queue of PredictionHistory rows written in grouped transactions
+
+    A group is flushed when it reaches `max_batch` rows, or `flush_ms` after
+    its first row. In group mode the wait only applies when the previous group
+    held more than one row, so a lone request is committed right away. Each
+    group is one Core executemany plus the statistics counter update, in one
+    transaction. stop() flushes everything still queued.
+    """
+
+    def __init__(self, mode=PREDICTION_WRITE_MODE, db_engine=default_engine, flush_ms=WRITE_BEHIND_FLUSH_MS,
+                 max_batch=WRITE_BEHIND_MAX_BATCH, max_queue=WRITE_BEHIND_MAX_QUEUE,
+                 retries=WRITE_BEHIND_RETRIES, dead_letter_path=WRITE_BEHIND_DEAD_LETTER, allocator=None):
+        if mode not in ("group", "async"):
+            raise ValueError(f"PredictionWriter mode must be 'group' or 'async', not '{mode}'")
+        self.mode = mode
+        self.engine = db_engine
+        self.window = flush_ms / 1000.0
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.retries = retries
+        self.dead_letter_path = dead_letter_path
+        self.allocator = allocator or IdAllocator(db_engine=db_engine)
+
+        self._queue = None
+        self._task = None
+        self._closed = False
+        self._last_batch_size = 0
+
+        # Metrics
+        self.total_rows = 0
+        self.total_flushes = 0
+        self.total_flush_time = 0.0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+
+    async def start(self):
+        await run_blocking(self.allocator.initialize)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting rows, flush everything queued and wait for it"""
+        if self._task is None:
+            return
+        self._closed = True
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, row):
+        """Queue a row (with its id set); in group mode, wait until it is committed"""
+        if self._closed:
+            raise RuntimeError("Prediction writer is shutting down")
+        future = asyncio.get_running_loop().create_future() if self.mode == "group" else None
+        await self._queue.put((row, future))
+        if future is not None:
+            await future
+
+    def _drain(self, batch):
+        stop = False
+        while len(batch) < self.max_batch and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                stop = True
+                continue
+            batch.append(item)
+        return stop
+
+    async def _run(self):
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            if item is None:
+                stop = True
+                batch = []
+            else:
+                batch = [item]
+            stop = self._drain(batch) or stop
+
+            wait = self.mode == "async" or self._last_batch_size > 1
+            if not stop and self.window > 0 and len(batch) < self.max_batch and wait:
+                await asyncio.sleep(self.window)
+                stop = self._drain(batch) or stop
+
+            if batch:
+                await self._flush(batch)
+            if stop:
+                # Shutdown: write whatever was queued behind the stop marker too
+                while not self._queue.empty():
+                    batch = []
+                    self._drain(batch)
+                    if batch:
+                        await self._flush(batch)
+
+    def _write(self, rows):
+        high_risk = sum(1 for row in rows if row["prediction"] == "High Risk")
+        low_risk = sum(1 for row in rows if row["prediction"] == "Low Risk")
+        with self.engine.begin() as conn:
+            conn.execute(insert(PredictionHistory), rows)
+            apply_statistics_delta(conn, predictions=len(rows), high_risk=high_risk, low_risk=low_risk)
+
+    async def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        futures = [future for _, future in batch if future is not None]
+        start = time.perf_counter()
+
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                await run_blocking(self._write, rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                self.failed_flushes += 1
+                if attempt < self.retries:
+                    await asyncio.sleep(0.05 * 2 ** attempt)
+
+        self._last_batch_size = len(rows)
+        self.total_flushes += 1
+        self.total_flush_time += time.perf_counter() - start
+
+        if error is None:
+            self.total_rows += len(rows)
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        print(f"Prediction write-behind flush of {len(rows)} rows failed: {error}")
+        if futures:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            await run_blocking(self._dead_letter, rows)
+
+    def _dead_letter(self, rows):
+        directory = os.path.dirname(self.dead_letter_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        self.dead_lettered += len(rows)
+
+    def snapshot(self):
+        """Rows written, flush sizes and failures since startup"""
+        return {
+            "mode": self.mode,
+            "flush_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "total_rows": self.total_rows,
+            "total_flushes": self.total_flushes,
+            "mean_batch_size": round(self.total_rows / self.total_flushes, 2) if self.total_flushes else 0,
+            "mean_flush_ms": round(self.total_flush_time / self.total_flushes * 1000, 3) if self.total_flushes else 0,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+        }
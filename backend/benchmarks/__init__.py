@@ -0,0 +1 @@
+# Heart Disease Prediction System - Benchmarks
@@ -0,0 +1,286 @@
+"""
+API load test: throughput and latency percentiles of the hot endpoints
+
+Seeds a fresh temporary database from create_sample_dataset (train_model.py)
+with a configurable number of predictions and profiles, starts the app
+in-process and drives each scenario with a fixed number of requests at a
+fixed concurrency:
+
+    predict           POST /predict for an existing patient
+    stats             GET /stats
+    profiles          GET /profiles (first page)
+    timeline          GET /profiles/{patient_id}/timeline
+    report            GET /report/{prediction_id}
+    export_patients   GET /export/patients/excel
+    export_high_risk  GET /export/high-risk/excel
+
+Results (throughput, p50/p95/p99/max latency, errors) are written as JSON
+together with the settings of the run. Pass an earlier result file as
+--compare to print the change per scenario and flag regressions.
+
+Usage (from backend/, after `python train_model.py`; requires httpx):
+    python -m benchmarks.bench_api [--rows 10000] [--profiles 1000] [--concurrency 16]
+        [--requests 300] [--export-requests 3] [--only predict,stats] [--no-cache]
+        [--output results.json] [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SCENARIOS = ("predict", "stats", "profiles", "timeline", "report", "export_patients", "export_high_risk")
+HEAVY_SCENARIOS = ("export_patients", "export_high_risk")
+FEATURES = ("age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+            "thalach", "exang", "oldpeak", "slope", "ca", "thal")
+
+
+def configure_environment(args, workdir):
+    """Point the app at a scratch database and directories (read when main is imported)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench_api.db')}"
+    os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(workdir, "report_cache"))
+    os.environ.setdefault("JOB_ARTIFACT_DIR", os.path.join(workdir, "jobs"))
+    if args.no_cache:
+        os.environ["PREDICT_CACHE_SIZE"] = "0"
+        os.environ["REPORT_CACHE_MAX_MB"] = "0"
+
+
+def seed(engine, n_rows, n_profiles, chunk=20000):
+    """Profiles plus n_rows predictions built from the sample dataset, spread over a year"""
+    from sqlalchemy import insert
+    from app.database import Base, PatientProfile, PredictionHistory, rebuild_statistics
+    from train_model import create_sample_dataset
+
+    df = create_sample_dataset(n_samples=n_rows)
+    rng = np.random.default_rng(42)
+    # Stand-in for the model's output: correlated with the target, not identical
+    risk = np.clip(df["target"].to_numpy() * 0.45 + rng.uniform(0.0, 0.55, n_rows), 0.01, 0.99)
+    now = datetime.utcnow()
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(PatientProfile), [
+            dict(patient_id=f"BENCH{i:07d}", name=f"Bench Patient {i}", date_of_birth="1970-01-01",
+                 gender="Male" if i % 2 else "Female", phone=f"01{i:09d}",
+                 email=f"patient{i}@example.com", created_at=now - timedelta(days=400), updated_at=now)
+            for i in range(n_profiles)
+        ])
+        records = df[list(FEATURES)].to_dict("records")
+        for start in range(0, n_rows, chunk):
+            rows = []
+            for i in range(start, min(start + chunk, n_rows)):
+                created = now - timedelta(minutes=int((n_rows - i) * 525600 / n_rows))
+                rows.append(dict(
+                    records[i], oldpeak=float(records[i]["oldpeak"]), profile_id=i % n_profiles + 1,
+                    prediction="High Risk" if risk[i] >= 0.5 else "Low Risk",
+                    risk_probability=float(risk[i]), created_at=created, updated_at=created
+                ))
+            conn.execute(insert(PredictionHistory), rows)
+        rebuild_statistics(conn)
+
+    return [{key: (float(value) if key == "oldpeak" else int(value)) for key, value in row.items()}
+            for row in records[:1000]]
+
+
+def request_factory(name, samples, n_rows, n_profiles):
+    """(method, url, kwargs) for the i-th request of a scenario"""
+    rng = random.Random(name)
+
+    def patient_id():
+        return f"BENCH{rng.randrange(n_profiles):07d}"
+
+    if name == "predict":
+        return lambda i: ("POST", "/predict", {"json": dict(samples[i % len(samples)], patient_id=patient_id())})
+    if name == "stats":
+        return lambda i: ("GET", "/stats", {})
+    if name == "profiles":
+        return lambda i: ("GET", "/profiles", {"params": {"limit": 100}})
+    if name == "timeline":
+        return lambda i: ("GET", f"/profiles/{patient_id()}/timeline", {})
+    if name == "report":
+        return lambda i: ("GET", f"/report/{rng.randrange(n_rows) + 1}", {})
+    if name == "export_patients":
+        return lambda i: ("GET", "/export/patients/excel", {})
+    if name == "export_high_risk":
+        return lambda i: ("GET", "/export/high-risk/excel", {})
+    raise ValueError(f"Unknown scenario '{name}'")
+
+
+async def run_scenario(client, make_request, n_requests, concurrency, warmup):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sizes, errors = [], [], {}
+
+    async def one(i, record):
+        method, url, kwargs = make_request(i)
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            body = response.content  # Streamed exports are only done once the body is read
+            elapsed = time.perf_counter() - start
+        if not record:
+            return
+        if response.status_code >= 400:
+            errors[response.status_code] = errors.get(response.status_code, 0) + 1
+        else:
+            latencies.append(elapsed)
+            sizes.append(len(body))
+
+    await asyncio.gather(*(one(i, False) for i in range(warmup)))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, True) for i in range(warmup, warmup + n_requests)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "mean_bytes": int(np.mean(sizes)) if sizes else 0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print the change against an earlier run; returns the scenarios that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+    print(f"{'scenario':>18} {'rps':>8} {'p50':>8} {'p99':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+
+        def change(key):
+            if not before.get(key) or result.get(key) is None:
+                return None
+            return result[key] / before[key] - 1
+
+        rps, p50, p99 = change("throughput_rps"), change("p50_ms"), change("p99_ms")
+        regressed = (rps is not None and rps < -tolerance) or (p99 is not None and p99 > tolerance)
+        if regressed:
+            regressions.append(name)
+        cells = " ".join(f"{value:>+8.1%}" if value is not None else f"{'-':>8}" for value in (rps, p50, p99))
+        print(f"{name:>18} {cells}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+async def run(args, scenarios):
+    import httpx
+    import main
+    from app.database import engine
+
+    print(f"Seeding {args.rows} predictions for {args.profiles} profiles...")
+    start = time.perf_counter()
+    samples = seed(engine, args.rows, args.profiles)
+    print(f"  {time.perf_counter() - start:.1f}s")
+
+    await main.startup_event()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"{'scenario':>18} {'ok':>6} {'err':>4} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for name in scenarios:
+                heavy = name in HEAVY_SCENARIOS
+                result = await run_scenario(
+                    client, request_factory(name, samples, args.rows, args.profiles),
+                    n_requests=args.export_requests if heavy else args.requests,
+                    concurrency=min(args.concurrency, args.export_concurrency) if heavy else args.concurrency,
+                    warmup=1 if heavy else args.warmup,
+                )
+                results[name] = result
+                print(f"{name:>18} {result['ok']:>6} {sum(result['errors'].values()):>4} "
+                      f"{result['throughput_rps'] or 0:>9.1f} {result['p50_ms']:>9.2f} "
+                      f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+    finally:
+        await main.shutdown_event()
+    return results
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="seeded predictions")
+    parser.add_argument("--profiles", type=int, default=1000, help="seeded patient profiles")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--export-requests", type=int, default=3, help="measured requests per Excel export")
+    parser.add_argument("--export-concurrency", type=int, default=2)
+    parser.add_argument("--only", default=",".join(SCENARIOS), help="comma-separated scenarios")
+    parser.add_argument("--no-cache", action="store_true", help="disable the prediction and report caches")
+    parser.add_argument("--output", default=None, help="JSON file (default: bench_api_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative drop in req/s or rise in p99 counted as a regression")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+    if args.profiles < 1 or args.rows < args.profiles:
+        parser.error("--rows must be at least --profiles, and --profiles at least 1")
+
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    configure_environment(args, workdir)
+    started_at = datetime.utcnow()
+    results = asyncio.run(run(args, scenarios))
+
+    output = args.output or f"bench_api_{started_at.strftime('%Y%m%d-%H%M%S')}.json"
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "rows": args.rows,
+            "profiles": args.profiles,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "export_requests": args.export_requests,
+            "export_concurrency": args.export_concurrency,
+            "caches": not args.no_cache,
+            "environment": {key: os.environ[key] for key in sorted(os.environ)
+                            if key.startswith(("PREDICT", "REPORT_CACHE", "SQLITE", "DB_", "CPU_WORKERS"))},
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            sys.exit(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main_bench()
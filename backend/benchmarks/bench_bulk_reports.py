@@ -0,0 +1,86 @@
+"""
+Bulk report rendering: scaling with worker processes
+
+Renders the same synthetic cohort into a ZIP with stream_report_zip, once
+per process pool size (no report cache), and prints reports/s and the
+speedup over a single worker. Speedup is capped by the number of cores.
+
+Usage (from backend/):
+    python -m benchmarks.bench_bulk_reports [--reports 400] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from bulk_reports import BulkReportJob, render_report_chunk, stream_report_zip
+
+
+def synthetic_cohort(n_reports, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for i in range(1, n_reports + 1):
+        high_risk = rng.random() < 0.4
+        report_data = {
+            'id': i, 'patient_id': f"bench{i:05d}", 'name': f"Patient {i}",
+            'age': rng.randint(30, 80), 'sex': rng.choice(["Male", "Female"]),
+            'cp': rng.randint(0, 3), 'trestbps': rng.randint(90, 180),
+            'chol': rng.randint(150, 350), 'fbs': rng.randint(0, 1),
+            'restecg': rng.randint(0, 2), 'thalach': rng.randint(90, 200),
+            'exang': rng.randint(0, 1), 'oldpeak': round(rng.uniform(0, 4), 1),
+            'slope': rng.randint(0, 2), 'ca': rng.randint(0, 3), 'thal': rng.randint(0, 3),
+            'prediction': "High Risk" if high_risk else "Low Risk",
+            'risk_probability': round(rng.uniform(50, 99) if high_risk else rng.uniform(1, 50), 2),
+            'created_at': "2024-01-01 09:00:00", 'report_date': datetime(2024, 1, 1, 9, 0),
+        }
+        items.append((f"key{i}", report_data))
+    return items
+
+
+async def render_zip(items, workers):
+    job = BulkReportJob(len(items))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm up the workers (imports, style sheet) outside the timing
+        await asyncio.gather(*(
+            asyncio.get_running_loop().run_in_executor(executor, render_report_chunk, [items[0][1]])
+            for _ in range(workers)
+        ))
+
+        start = time.perf_counter()
+        size = 0
+        async for chunk in stream_report_zip(job, items, executor=executor, max_in_flight=workers * 2):
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+
+    assert job.rendered == len(items), job.snapshot()
+    return elapsed, size
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reports", type=int, default=400)
+    parser.add_argument("--workers", default=",".join(str(w) for w in default_workers),
+                        help="comma-separated process pool sizes")
+    args = parser.parse_args()
+
+    items = synthetic_cohort(args.reports)
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    print(f"{args.reports} reports, {cores} CPU core(s)")
+    print(f"{'workers':>8} {'seconds':>9} {'reports/s':>10} {'speedup':>8} {'zip MB':>7}")
+    baseline = None
+    for workers in worker_counts:
+        elapsed, size = asyncio.run(render_zip(items, workers))
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {args.reports / elapsed:>10.1f} "
+              f"{baseline / elapsed:>7.2f}x {size / 1e6:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
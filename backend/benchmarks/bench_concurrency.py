@@ -0,0 +1,86 @@
+"""
+Event-loop responsiveness under a concurrent slow workload
+
+Fires a stream of /predict and /stats requests and measures their latency,
+first on an idle server and then while PDF reports are rendered at the same
+time. With blocking work kept off the event loop, p99 should stay flat.
+
+Usage (from backend/, after `python train_model.py`; requires httpx):
+    python -m benchmarks.bench_concurrency [--requests 200] [--reports 20]
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+import httpx
+
+import main
+
+SAMPLE = dict(
+    age=55, sex=1, cp=2, trestbps=140, chol=240, fbs=0, restecg=1,
+    thalach=130, exang=0, oldpeak=1.5, slope=1, ca=1, thal=2
+)
+
+
+def percentiles(latencies):
+    ms = np.array(latencies) * 1000
+    return {p: float(np.percentile(ms, p)) for p in (50, 95, 99)}
+
+
+async def timed(client, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def probe(client, patient_id, n_requests, concurrency):
+    """Send n_requests alternating /predict and /stats, concurrency at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            if i % 2:
+                return await timed(client, "GET", "/stats")
+            return await timed(client, "POST", "/predict", json=dict(SAMPLE, patient_id=patient_id))
+
+    return await asyncio.gather(*(one(i) for i in range(n_requests)))
+
+
+async def render_reports(client, prediction_id, n_reports):
+    await asyncio.gather(*(
+        timed(client, "GET", f"/report/{prediction_id}") for _ in range(n_reports)
+    ))
+
+
+async def run(args):
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        patient_id = f"bench-{int(time.time())}"
+        response = await client.post("/predict", json=dict(SAMPLE, profile_data={
+            "patient_id": patient_id, "name": "Benchmark Patient",
+            "date_of_birth": "1970-01-01", "gender": "Male", "phone": "0000000000"
+        }))
+        prediction_id = response.json()["prediction_id"]
+
+        idle = await probe(client, patient_id, args.requests, args.concurrency)
+
+        report_task = asyncio.create_task(render_reports(client, prediction_id, args.reports))
+        loaded = await probe(client, patient_id, args.requests, args.concurrency)
+        await report_task
+
+    await main.shutdown_event()
+
+    for label, latencies in (("idle", idle), (f"with {args.reports} reports", loaded)):
+        p = percentiles(latencies)
+        print(f"{label:<20} p50={p[50]:7.2f} ms  p95={p[95]:7.2f} ms  p99={p[99]:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--reports", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
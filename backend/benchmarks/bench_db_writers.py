@@ -0,0 +1,125 @@
+"""
+Concurrent writers on SQLite: default settings vs tuned pragmas
+
+Writer threads insert predictions one transaction at a time (as /predict
+does, including the statistics counter update) while reader threads run
+dashboard-style aggregate queries. The run is repeated on a fresh
+database with SQLite's defaults (rollback journal, synchronous=FULL) and
+with SQLITE_PRAGMAS (WAL, synchronous=NORMAL, cache, mmap, busy_timeout).
+
+Usage (from backend/):
+    python -m benchmarks.bench_db_writers [--writers 8] [--readers 2] [--seconds 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (
+    Base, PredictionHistory, SQLITE_PRAGMAS, create_db_engine, rebuild_statistics
+)
+from benchmarks.bench_pagination import seed
+
+
+def run(pragmas, writers, readers, seconds, seed_rows):
+    path = os.path.join(tempfile.mkdtemp(), "writers.db")
+    engine = create_db_engine(f"sqlite:///{path}", pragmas=pragmas)
+    Base.metadata.create_all(bind=engine)
+    seed(engine, seed_rows)
+    with engine.begin() as conn:
+        rebuild_statistics(conn)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    latencies = []
+    errors = []
+    reads = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def write_loop(worker):
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.add(PredictionHistory(
+                        profile_id=(worker * 7919 + i) % 1000 + 1, age=55, sex=1, cp=2, trestbps=130,
+                        chol=240, fbs=0, restecg=1, thalach=150, exang=0, oldpeak=1.2, slope=1,
+                        ca=0, thal=2, prediction="High Risk", risk_probability=0.7
+                    ))
+                    db.commit()
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+            i += 1
+
+    def read_loop():
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(PredictionHistory.prediction, func.count())
+                                 .group_by(PredictionHistory.prediction)).all()
+                with lock:
+                    reads[0] += 1
+            except OperationalError as e:
+                with lock:
+                    errors.append(str(e.orig))
+
+    threads = [threading.Thread(target=write_loop, args=(w,)) for w in range(writers)]
+    threads += [threading.Thread(target=read_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    engine.dispose()
+
+    latencies.sort()
+    percentile = (lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000) \
+        if latencies else (lambda q: float("nan"))
+    return {
+        "journal_mode": journal_mode,
+        "writes_per_s": len(latencies) / seconds,
+        "reads_per_s": reads[0] / seconds,
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else float("nan"),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else "",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed-rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run, "
+          f"{args.seed_rows} seeded predictions")
+    print(f"{'config':>8} {'journal':>8} {'writes/s':>9} {'reads/s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'errors':>7}")
+    for name, pragmas in [("default", {}), ("tuned", SQLITE_PRAGMAS)]:
+        result = run(pragmas, args.writers, args.readers, args.seconds, args.seed_rows)
+        print(f"{name:>8} {result['journal_mode']:>8} {result['writes_per_s']:>9.1f} "
+              f"{result['reads_per_s']:>8.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['errors']:>7}")
+        if result["first_error"]:
+            print(f"{'':>8} first error: {result['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
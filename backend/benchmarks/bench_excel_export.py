@@ -0,0 +1,80 @@
+"""
+Excel export throughput and memory ceiling
+
+Seeds a temporary database with synthetic predictions (1M by default), then
+runs the streamed /export/patients/excel path in a fresh process, discarding
+the bytes, and checks the child's peak RSS against a ceiling.
+
+Usage (from backend/):
+    python -m benchmarks.bench_excel_export [--rows 1000000] [--max-rss-mb 300]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from benchmarks.bench_pagination import seed
+
+
+def export(db_path, sheet):
+    """Child process: stream one export and print bytes and rows/s"""
+    from excel_exporter import stream_excel, write_patients_workbook, write_high_risk_workbook
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Session = sessionmaker(bind=engine)
+    write_workbook = write_patients_workbook if sheet == "patients" else write_high_risk_workbook
+
+    start = time.perf_counter()
+    total = sum(len(chunk) for chunk in stream_excel(write_workbook, session_factory=Session))
+    print(f"{total} {time.perf_counter() - start:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--max-rss-mb", type=float, default=300)
+    parser.add_argument("--sheet", choices=["patients", "high-risk"], default="patients")
+    parser.add_argument("--export-only", metavar="DB_PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.export_only:
+        export(args.export_only, args.sheet)
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(), "export.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    print(f"Seeding {args.rows} predictions...")
+    seed(engine, args.rows)
+    engine.dispose()
+
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_excel_export",
+         "--export-only", db_path, "--sheet", args.sheet],
+        check=True, capture_output=True, text=True
+    ).stdout.split()
+    size, seconds = int(output[0]), float(output[1])
+
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    print(f"rows          : {args.rows}")
+    print(f"xlsx size     : {size / 1e6:.1f} MB")
+    print(f"export time   : {seconds:.1f} s ({args.rows / seconds:,.0f} rows/s)")
+    print(f"peak RSS      : {peak_mb:.0f} MB (ceiling {args.max_rss_mb:.0f} MB)")
+
+    if peak_mb > args.max_rss_mb:
+        print("FAILED: export exceeded the memory ceiling")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
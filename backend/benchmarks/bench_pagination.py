@@ -0,0 +1,100 @@
+"""
+Offset vs keyset (cursor) pagination at deep pages
+
+Seeds a temporary database with synthetic prediction history and times
+/patients at increasing depths, once with skip/limit and once with the
+equivalent cursor.
+
+Usage (from backend/; requires httpx):
+    python -m benchmarks.bench_pagination [--rows 200000] [--limit 100]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import main
+from app.database import Base, get_db, PatientProfile, PredictionHistory
+from app.pagination import encode_cursor
+
+
+def seed(engine, n_rows, n_profiles=1000):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(PatientProfile), [
+            dict(patient_id=f"B{i:06d}", name=f"Patient {i}", date_of_birth="1970-01-01",
+                 gender="Male", phone="0000000000", created_at=now, updated_at=now)
+            for i in range(n_profiles)
+        ])
+        chunk = 50000
+        for start in range(0, n_rows, chunk):
+            conn.execute(insert(PredictionHistory), [
+                dict(profile_id=i % n_profiles + 1, age=50, sex=1, cp=1, trestbps=130, chol=220,
+                     fbs=0, restecg=1, thalach=150, exang=0, oldpeak=1.0, slope=1, ca=0, thal=2,
+                     prediction="Low Risk", risk_probability=0.2,
+                     created_at=now - timedelta(seconds=i))
+                for i in range(start, min(start + chunk, n_rows))
+            ])
+
+
+def best_ms(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'pages.db')}")
+    Base.metadata.create_all(bind=engine)
+    print(f"Seeding {args.rows} predictions...")
+    seed(engine, args.rows)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(main.app)
+
+    print(f"{'depth':>10} {'skip/limit':>12} {'cursor':>10}")
+    depth = 0
+    while depth < args.rows:
+        # Cursor equivalent to skip=depth: the sort key of the row just before it
+        cursor = None
+        if depth:
+            db = Session()
+            row = db.query(PredictionHistory.created_at, PredictionHistory.id).order_by(
+                PredictionHistory.created_at.desc(), PredictionHistory.id.desc()
+            ).offset(depth - 1).first()
+            db.close()
+            cursor = encode_cursor(row.created_at, row.id)
+
+        offset_ms = best_ms(lambda: client.get("/patients", params={"skip": depth, "limit": args.limit}))
+        cursor_params = {"limit": args.limit, **({"cursor": cursor} if cursor else {})}
+        cursor_ms = best_ms(lambda: client.get("/patients", params=cursor_params))
+        print(f"{depth:>10} {offset_ms:>9.2f} ms {cursor_ms:>7.2f} ms")
+
+        depth = depth * 10 if depth else 1000
+
+    main.app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,82 @@
+"""
+Compiled scorer vs sklearn pipeline
+
+Checks that CompiledScorer matches scaler.transform + predict + predict_proba
+on the sample dataset, then times a single /predict-style call both ways.
+
+Usage (from backend/, after `python train_model.py`):
+    python -m benchmarks.bench_scorer
+"""
+import pickle
+import sys
+import time
+import numpy as np
+
+from app.scorer import CompiledScorer
+from train_model import create_sample_dataset
+
+MODEL_PATH = "models/model.pkl"
+SCALER_PATH = "models/scaler.pkl"
+
+
+def check_parity(model, scaler, scorer, X):
+    """Return (max probability difference, number of label mismatches)"""
+    X_scaled = scaler.transform(X)
+    sk_labels = model.predict(X_scaled)
+    sk_probs = model.predict_proba(X_scaled)[:, 1]
+
+    labels, probs = scorer.score_batch(X)
+    max_diff = float(np.max(np.abs(probs - sk_probs)))
+    mismatches = int(np.sum(labels != sk_labels))
+
+    for row, sk_label, sk_prob in zip(X, sk_labels, sk_probs):
+        label, prob = scorer.score(row.tolist())
+        max_diff = max(max_diff, abs(prob - sk_prob))
+        mismatches += int(label != sk_label)
+
+    return max_diff, mismatches
+
+
+def time_per_call(func, rows, repeat=3):
+    """Best per-call latency in microseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            func(row)
+        best = min(best, (time.perf_counter() - start) / len(rows))
+    return best * 1e6
+
+
+def main():
+    with open(MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+    with open(SCALER_PATH, "rb") as f:
+        scaler = pickle.load(f)
+    scorer = CompiledScorer.from_sklearn(model, scaler)
+
+    X = create_sample_dataset().drop("target", axis=1).to_numpy(dtype=float)
+
+    max_diff, mismatches = check_parity(model, scaler, scorer, X)
+    print(f"Parity: max |p - p_sklearn| = {max_diff:.2e}, label mismatches = {mismatches}")
+    if max_diff > 1e-9 or mismatches:
+        print("FAILED: compiled scorer does not match the sklearn pipeline")
+        sys.exit(1)
+
+    rows = [row.tolist() for row in X[:500]]
+
+    def sklearn_call(row):
+        scaled = scaler.transform(np.array([row]))
+        model.predict(scaled)
+        model.predict_proba(scaled)
+
+    sklearn_us = time_per_call(sklearn_call, rows)
+    compiled_us = time_per_call(scorer.score, rows)
+
+    print(f"sklearn pipeline : {sklearn_us:8.1f} us/call")
+    print(f"compiled scorer  : {compiled_us:8.1f} us/call")
+    print(f"speedup          : {sklearn_us / compiled_us:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Patient search latency: FTS5 prefix index vs LIKE scan
+
+Seeds a temporary database with synthetic profiles (random names, phones,
+emails), builds the full-text index and times typical search-as-you-type
+queries through app.search, once per query shape. The target is under
+10 ms per query at one million profiles.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search [--profiles 1000000] [--limit 10] [--like]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, PatientProfile, create_db_engine, setup_profile_search
+from app.search import fts_search_query, like_search_query, search_terms
+
+FIRST_NAMES = ["Mohammad", "Rahim", "Karim", "Ayesha", "Fatima", "Nusrat", "John", "Maria", "Ahmed",
+               "Sadia", "Tanvir", "Priya", "Rohan", "Emily", "David", "Sara", "Imran", "Nadia", "Omar",
+               "Lina", "Hasan", "Jamal", "Farhana", "Arif", "Mahmud", "Sumaiya", "Kamal", "Ruma"]
+LAST_NAMES = ["Rahman", "Hossain", "Islam", "Khan", "Ahmed", "Chowdhury", "Karim", "Smith", "Garcia",
+              "Akter", "Uddin", "Sarkar", "Das", "Roy", "Begum", "Miah", "Sheikh", "Alam", "Haque"]
+
+QUERIES = [
+    ("one letter", "k"),
+    ("one short prefix", "mo"),
+    ("name prefix", "moham"),
+    ("two name prefixes", "moham rah"),
+    ("full name", "fatima khan"),
+    ("phone prefix", "01712"),
+    ("long phone prefix", "017123456"),
+    ("email prefix", "sadia.k"),
+    ("common terms", "example com"),
+    ("patient id", "P0123456"),
+    ("no match", "zzzz"),
+    ("long, no match", "examplez"),
+]
+
+
+def seed(engine, n_profiles, chunk=50000):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, n_profiles, chunk):
+            rows = []
+            for i in range(start, min(start + chunk, n_profiles)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                rows.append(dict(
+                    patient_id=f"P{i:07d}", name=f"{first} {last}", date_of_birth="1970-01-01",
+                    gender=rng.choice(["Male", "Female"]), phone=f"01{rng.randint(300000000, 999999999)}",
+                    email=f"{first.lower()}.{last.lower()}{rng.randint(1, 999)}@example.com",
+                    created_at=now, updated_at=now
+                ))
+            conn.execute(insert(PatientProfile), rows)
+
+
+def timings_ms(func, repeat):
+    func()  # Warm the page cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--like", action="store_true", help="also time the LIKE fallback (slow)")
+    args = parser.parse_args()
+
+    engine = create_db_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}")
+    Base.metadata.create_all(bind=engine)
+    print(f"Seeding {args.profiles} profiles...")
+    start = time.perf_counter()
+    seed(engine, args.profiles)
+    print(f"  {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if not setup_profile_search(conn):
+            raise SystemExit("SQLite was built without FTS5")
+    print(f"Built the search index in {time.perf_counter() - start:.1f}s")
+
+    Session = sessionmaker(bind=engine, autoflush=False)
+    print(f"{'query':>18} {'text':>12} {'hits':>5} {'p50 ms':>8} {'p99 ms':>8}"
+          + (f" {'LIKE p50':>9}" if args.like else ""))
+    with Session() as db:
+        for label, text in QUERIES:
+            terms = search_terms(text)
+            statement = fts_search_query(terms, args.limit, text)
+            results = db.execute(statement).scalars().all()
+            hits = len(results)
+            p50, p99 = timings_ms(lambda: db.execute(statement).scalars().all(), args.repeat)
+            line = f"{label:>18} {text:>12} {hits:>5} {p50:>8.2f} {p99:>8.2f}"
+            if args.like:
+                like = like_search_query(terms, args.limit)
+                line += f" {timings_ms(lambda: db.execute(like).scalars().all(), 3)[0]:>9.1f}"
+            print(line + ("" if p99 < 10 else "  > 10 ms"))
+            db.expunge_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cold-start model loading: pickle vs pickle-free JSON artifact
+
+Each measurement runs in a fresh interpreter, so import time (sklearn for
+the pickle path, NumPy only for model.json) is included.
+
+Usage (from backend/, after `python train_model.py`):
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from app.model_registry import ModelRegistry
+
+LOAD_PICKLE = """
+from app.model_registry import ModelRegistry
+import os
+registry = ModelRegistry()
+version_dir = os.path.join(registry.registry_dir, {version!r})
+registry._load_pickles({version!r}, os.path.join(version_dir, "model.pkl"),
+                       os.path.join(version_dir, "scaler.pkl"), {{}})
+"""
+
+LOAD_ARTIFACT = """
+from app.model_registry import ModelRegistry
+ModelRegistry().load({version!r})
+"""
+
+
+def cold_start(code, runs):
+    """Median wall time in ms of running code in a new interpreter"""
+    env = dict(os.environ, MODEL_ALLOW_PICKLE="1")  # The pickle path is opt-in
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=os.getcwd(), env=env)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    version = ModelRegistry().current_version()
+    if version is None:
+        print("No registry version found. Run `python train_model.py` first.")
+        sys.exit(1)
+
+    baseline = cold_start("pass", args.runs)
+    pickle_ms = cold_start(LOAD_PICKLE.format(version=version), args.runs)
+    artifact_ms = cold_start(LOAD_ARTIFACT.format(version=version), args.runs)
+
+    print(f"Model version     : {version}")
+    print(f"empty interpreter : {baseline:8.1f} ms")
+    print(f"pickle (sklearn)  : {pickle_ms:8.1f} ms")
+    print(f"model.json (numpy): {artifact_ms:8.1f} ms")
+    print(f"speedup           : {(pickle_ms - baseline) / max(artifact_ms - baseline, 1e-9):8.1f}x (excluding interpreter start)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+/predict throughput by prediction history write mode (sync, group, async)
+
+Each mode runs in a fresh interpreter against its own temporary database
+(PREDICTION_WRITE_MODE and DATABASE_URL are read at import). After the
+server shuts down, the script checks that every acknowledged prediction is
+in prediction_history and that the statistics counters match.
+
+Usage (from backend/, after `python train_model.py`; requires httpx):
+    python -m benchmarks.bench_write_behind [--requests 2000] [--concurrency 32] [--synchronous FULL]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import asyncio, json, sys, time
+import httpx
+import numpy as np
+import main
+from sqlalchemy import func, select
+from app.database import engine, PredictionHistory, StatisticsSummary, STATISTICS_ROW_ID
+
+REQUESTS, CONCURRENCY = int(sys.argv[1]), int(sys.argv[2])
+SAMPLE = dict(age=55, sex=1, cp=2, trestbps=140, chol=240, fbs=0, restecg=1,
+              thalach=130, exang=0, oldpeak=1.5, slope=1, ca=1, thal=2)
+
+
+async def run():
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/profiles/create", json=dict(
+            patient_id="bench-writer", name="Bench Writer", date_of_birth="1970-01-01",
+            gender="Male", phone="0123456789"))
+
+        latencies, ids = [], []
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/predict", json=dict(SAMPLE, patient_id="bench-writer",
+                                                                    age=30 + i % 50))
+                latencies.append(time.perf_counter() - start)
+                if response.status_code == 200:
+                    ids.append(response.json()["prediction_id"])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        elapsed = time.perf_counter() - start
+        writer = (await client.get("/predict/writer")).json()
+    await main.shutdown_event()
+
+    with engine.connect() as conn:
+        stored = set(conn.execute(select(PredictionHistory.id)).scalars())
+        counted = conn.execute(select(StatisticsSummary.total_predictions)
+                               .where(StatisticsSummary.id == STATISTICS_ROW_ID)).scalar()
+    ms = np.array(latencies) * 1000
+    print(json.dumps({
+        "ok": len(ids), "elapsed": elapsed, "rps": len(ids) / elapsed,
+        "p50": float(np.percentile(ms, 50)), "p99": float(np.percentile(ms, 99)),
+        "missing": len(set(ids) - stored), "duplicates": len(ids) - len(set(ids)),
+        "stats_match": counted == len(stored),
+        "mean_batch": writer.get("mean_batch_size"),
+    }))
+
+
+asyncio.run(run())
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--synchronous", default=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+                        help="SQLite synchronous level (FULL fsyncs every commit)")
+    args = parser.parse_args()
+
+    print(f"{args.requests} /predict requests, concurrency {args.concurrency}, "
+          f"synchronous={args.synchronous}")
+    print(f"{'mode':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6} {'missing':>8} {'stats':>6}")
+    for mode in ("sync", "group", "async"):
+        path = os.path.join(tempfile.mkdtemp(), "writes.db")
+        env = dict(os.environ, PREDICTION_WRITE_MODE=mode, DATABASE_URL=f"sqlite:///{path}",
+                   SQLITE_SYNCHRONOUS=args.synchronous, PREDICT_CACHE_SIZE="0",
+                   REPORT_CACHE_DIR=os.path.join(os.path.dirname(path), "reports"),
+                   JOB_ARTIFACT_DIR=os.path.join(os.path.dirname(path), "jobs"))
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", CHILD, str(args.requests), str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>6} {result['rps']:>8.1f} {result['p50']:>8.2f} {result['p99']:>8.2f} "
+              f"{result['mean_batch'] or 1:>6} {result['missing']:>8} "
+              f"{'ok' if result['stats_match'] else 'DRIFT':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Query-count regression check for the listing endpoints
+
+Seeds a temporary database and counts the SQL statements executed by
+/profiles and /patients at several page sizes. The count must not grow
+with the page size (no N+1 access patterns). Exits non-zero on regression.
+
+Usage (from backend/; requires httpx):
+    python -m benchmarks.check_query_counts
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import main
+from app.database import Base, get_db, PatientProfile, PredictionHistory
+
+# Maximum statements per request, whatever the page size
+MAX_STATEMENTS = {"/profiles": 1, "/patients": 1}
+PAGE_SIZES = [1, 10, 100, 500]
+
+
+def seed(Session, n_profiles=200, predictions_per_profile=5):
+    db = Session()
+    now = datetime.utcnow()
+    for i in range(n_profiles):
+        profile = PatientProfile(
+            patient_id=f"Q{i:05d}", name=f"Patient {i}", date_of_birth="1970-01-01",
+            gender="Male", phone="0000000000", created_at=now
+        )
+        profile.predictions = [
+            PredictionHistory(
+                age=50, sex=1, cp=1, trestbps=130, chol=220, fbs=0, restecg=1,
+                thalach=150, exang=0, oldpeak=1.0, slope=1, ca=0, thal=2,
+                prediction="Low Risk", risk_probability=0.2,
+                created_at=now - timedelta(days=j)
+            )
+            for j in range(predictions_per_profile)
+        ]
+        db.add(profile)
+    db.commit()
+    db.close()
+
+
+def main_check():
+    tmp_dir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'queries.db')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    seed(Session)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(main.app)  # no startup: only the listing endpoints are called
+
+    failed = False
+    for path, limit in ((path, limit) for path in MAX_STATEMENTS for limit in PAGE_SIZES):
+        statements.clear()
+        response = client.get(path, params={"limit": limit})
+        response.raise_for_status()
+        count = len(statements)
+        ok = count <= MAX_STATEMENTS[path]
+        failed |= not ok
+        print(f"{path:<10} limit={limit:<4} rows={len(response.json()):<4} statements={count:<4} {'ok' if ok else 'TOO MANY'}")
+
+    main.app.dependency_overrides.clear()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_check()
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import select
+from app.database import PredictionHistory, PatientProfile
+from app.executor import CPU_WORKERS, get_process_executor, run_blocking
+from app.report_cache import report_cache_key
+from app.report_generator import generate_patient_report, REPORT_TEMPLATE_VERSION
+from app.schemas import PredictionFilters
+from filtered_exporter import apply_filters
+
+# Reports sent to a worker process per task (amortizes pickling and IPC)
+BULK_REPORT_CHUNK_SIZE = int(os.getenv("BULK_REPORT_CHUNK_SIZE", "8"))
+
+# Largest cohort accepted in one request
+BULK_REPORT_MAX_ITEMS = int(os.getenv("BULK_REPORT_MAX_ITEMS", "5000"))
+
+# Finished jobs kept for progress queries
+BULK_REPORT_MAX_JOBS = 100
+
+
+class BulkReportJob:
+    """Progress of one bulk report download"""
+
+    def __init__(self, total):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.rendered = 0
+        self.cached = 0
+        self.failed = 0
+        self.errors = []
+        self.status = "running"
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    def finish(self, status):
+        self.status = status
+        self.finished_at = datetime.utcnow()
+
+    def snapshot(self):
+        done = self.rendered + self.cached + self.failed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "done": done,
+            "rendered": self.rendered,
+            "cached": self.cached,
+            "failed": self.failed,
+            "progress": round(done / self.total, 4) if self.total else 1.0,
+            "errors": self.errors[:20],
+            "created_at": self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            "finished_at": self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+        }
+
+
+class BulkReportJobs:
+    """In-process registry of recent bulk report jobs"""
+
+    def __init__(self, max_jobs=BULK_REPORT_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, total):
+        job = BulkReportJob(total)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+def cohort_query(prediction_ids=None, filters: PredictionFilters = None):
+    """Predictions (with profile identity) selected by ids and/or filters, capped at one over the limit"""
+    query = select(
+        PredictionHistory, PatientProfile.name, PatientProfile.patient_id, PatientProfile.updated_at
+    ).outerjoin(PatientProfile, PatientProfile.id == PredictionHistory.profile_id)
+
+    if prediction_ids:
+        query = query.where(PredictionHistory.id.in_(prediction_ids))
+    if filters is not None:
+        query = apply_filters(query, filters)
+
+    return query.order_by(PredictionHistory.created_at, PredictionHistory.id).limit(BULK_REPORT_MAX_ITEMS + 1)
+
+
+def cohort_items(rows):
+    """(cache key, report data) per row, with the same data as /report/{prediction_id}"""
+    items = []
+    for prediction, name, patient_id, profile_updated_at in rows:
+        report_data = prediction.to_dict()
+        report_data['name'] = name if name is not None else "Unknown"
+        report_data['patient_id'] = patient_id if patient_id is not None else "Unknown"
+        prediction_updated_at = prediction.updated_at or prediction.created_at
+        report_data['report_date'] = max(filter(None, [prediction_updated_at, profile_updated_at]))
+        key = report_cache_key(
+            prediction.id,
+            prediction_updated_at,
+            profile_updated_at,
+            REPORT_TEMPLATE_VERSION
+        )
+        items.append((key, report_data))
+    return items
+
+
+def report_filename(report_data):
+    return f"patient_{report_data['patient_id']}_report_{report_data['id']}.pdf"
+
+
+def render_report_chunk(report_datas):
+    """Worker process: render a chunk of reports, one (pdf bytes, error) per report"""
+    results = []
+    for report_data in report_datas:
+        try:
+            results.append((generate_patient_report(report_data).getvalue(), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+class _ZipBuffer:
+    """Unseekable sink for zipfile; bytes are taken out after every entry"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+
+async def stream_report_zip(job: BulkReportJob, items, cache=None, executor=None, max_in_flight=None):
+    """
+    Async generator of ZIP bytes containing one PDF per item
+
+    Cached PDFs are written straight away; the rest are rendered in chunks
+    across the process pool, with at most `max_in_flight` chunks queued so
+    memory stays bounded and entries stream out as soon as they complete.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_process_executor()
+    max_in_flight = max_in_flight or CPU_WORKERS * 2
+
+    buffer = _ZipBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED)
+    pending = {}  # future -> chunk of items
+
+    def add_entry(report_data, pdf):
+        archive.writestr(report_filename(report_data), pdf)
+
+    async def collect(done):
+        for future in done:
+            chunk = pending.pop(future)
+            for (key, report_data), (pdf, error) in zip(chunk, future.result()):
+                if pdf is None:
+                    job.failed += 1
+                    job.errors.append(f"{report_data['id']}: {error}")
+                    continue
+                add_entry(report_data, pdf)
+                job.rendered += 1
+                if cache is not None:
+                    await run_blocking(cache.put, key, pdf)
+
+    try:
+        for start in range(0, len(items), BULK_REPORT_CHUNK_SIZE):
+            chunk = items[start:start + BULK_REPORT_CHUNK_SIZE]
+
+            if cache is not None:
+                cached = await run_blocking(lambda: [cache.get(key) for key, _ in chunk])
+                misses = []
+                for (key, report_data), pdf in zip(chunk, cached):
+                    if pdf is None:
+                        misses.append((key, report_data))
+                    else:
+                        add_entry(report_data, pdf)
+                        job.cached += 1
+                chunk = misses
+
+            if chunk:
+                future = loop.run_in_executor(
+                    executor, render_report_chunk, [report_data for _, report_data in chunk]
+                )
+                pending[future] = chunk
+
+            if len(pending) >= max_in_flight:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                await collect(done)
+
+            if buffer.data:
+                yield buffer.take()
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            await collect(done)
+            if buffer.data:
+                yield buffer.take()
+
+        if job.errors:
+            archive.writestr("errors.txt", "\n".join(job.errors) + "\n")
+        archive.close()
+        yield buffer.take()
+        job.finish("completed")
+    finally:
+        if job.status == "running":
+            # Client disconnected or rendering failed: drop work not yet started
+            for future in pending:
+                future.cancel()
+            job.finish("cancelled")
@@ -1,106 +1,61 @@
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from datetime import datetime
 from io import BytesIO
-from typing import List
-from app.database import PredictionHistory, PatientProfile
+from copy import copy
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from app.database import PredictionHistory, PatientProfile, SessionLocal
+from app.streaming import stream_output
 
-def create_patients_excel(db: Session) -> BytesIO:
-    """Create Excel file with all patient predictions"""
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Patient Predictions"
-    
-    # Header style
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=12)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers
-    headers = [
-        "ID", "Patient ID", "Patient Name", "Age", "Gender", "Phone",
-        "Chest Pain Type", "Blood Pressure", "Cholesterol", "Heart Rate",
-        "Prediction", "Risk %", "Doctor Notes", "Date"
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Get data with patient profiles
-    predictions = db.query(PredictionHistory).join(PatientProfile).all()
-    
-    # Data rows
-    for row_idx, pred in enumerate(predictions, 2):
-        profile = pred.profile
-        
-        data = [
-            pred.id,
-            profile.patient_id,
-            profile.name,
-            pred.age,
-            "Male" if pred.sex == 1 else "Female",
-            profile.phone,
-            get_chest_pain_text(pred.cp),
-            pred.trestbps,
-            pred.chol,
-            pred.thalach,
-            pred.prediction,
-            f"{pred.risk_probability:.2f}%",
-            pred.doctor_notes or "",
-            pred.created_at.strftime("%Y-%m-%d %H:%M")
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row_idx, column=col)
-            cell.value = value
-            cell.border = border
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-            
-            # Color code by risk
-            if col == 11:  # Prediction column
-                if value == "High Risk":
-                    cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                    cell.font = Font(color="9C0006", bold=True)
-                else:
-                    cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                    cell.font = Font(color="006100", bold=True)
-    
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        max_length = 0
-        column = get_column_letter(col)
-        for cell in ws[column]:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column].width = adjusted_width
-    
-    # Freeze header row
-    ws.freeze_panes = "A2"
-    
-    # Save to BytesIO
-    excel_file = BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
-    
-    return excel_file
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+MAX_COLUMN_WIDTH = 50
+
+# Shared styles: created once, referenced by every cell
+BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+HEADER_FONT = Font(color="FFFFFF", bold=True, size=12)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+DATA_ALIGNMENT = Alignment(horizontal="left", vertical="center")
+
+PATIENTS_HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+HIGH_RISK_HEADER_FILL = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")
+
+HIGH_RISK_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+HIGH_RISK_FONT = Font(color="9C0006", bold=True)
+LOW_RISK_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+LOW_RISK_FONT = Font(color="006100", bold=True)
+
+CRITICAL_RISK_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+CRITICAL_RISK_FONT = Font(color="FFFFFF", bold=True)
+ELEVATED_RISK_FILL = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+ELEVATED_RISK_FONT = Font(bold=True)
+
+# Highlight variants for data cells: name -> (fill, font)
+CELL_HIGHLIGHTS = {
+    "high_risk": (HIGH_RISK_FILL, HIGH_RISK_FONT),
+    "low_risk": (LOW_RISK_FILL, LOW_RISK_FONT),
+    "critical_risk": (CRITICAL_RISK_FILL, CRITICAL_RISK_FONT),
+    "elevated_risk": (ELEVATED_RISK_FILL, ELEVATED_RISK_FONT),
+}
+
+PATIENTS_HEADERS = [
+    "ID", "Patient ID", "Patient Name", "Age", "Gender", "Phone",
+    "Chest Pain Type", "Blood Pressure", "Cholesterol", "Heart Rate",
+    "Prediction", "Risk %", "Doctor Notes", "Date"
+]
+
+HIGH_RISK_HEADERS = [
+    "Patient ID", "Name", "Phone", "Age", "Gender",
+    "Risk %", "BP", "Cholesterol", "Latest Checkup", "Doctor Notes"
+]
 
 
 def get_chest_pain_text(cp: int) -> str:
@@ -114,97 +69,186 @@ def get_chest_pain_text(cp: int) -> str:
     return cp_map.get(cp, "Unknown")
 
 
-def create_high_risk_patients_excel(db: Session) -> BytesIO:
-    """Create Excel file with only high-risk patients"""
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "High Risk Patients"
-    
-    # Header style
-    header_fill = PatternFill(start_color="C00000", end_color="C00000", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=12)
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Headers
-    headers = [
-        "Patient ID", "Name", "Phone", "Age", "Gender",
-        "Risk %", "BP", "Cholesterol", "Latest Checkup", "Doctor Notes"
+def _export_query():
+    """Prediction columns joined with their profile (plain rows, no ORM objects)"""
+    return select(
+        PredictionHistory.id,
+        PredictionHistory.age,
+        PredictionHistory.sex,
+        PredictionHistory.cp,
+        PredictionHistory.trestbps,
+        PredictionHistory.chol,
+        PredictionHistory.thalach,
+        PredictionHistory.prediction,
+        PredictionHistory.risk_probability,
+        PredictionHistory.doctor_notes,
+        PredictionHistory.created_at,
+        PatientProfile.patient_id,
+        PatientProfile.name,
+        PatientProfile.phone,
+    ).join(PatientProfile, PatientProfile.id == PredictionHistory.profile_id)
+
+
+def _stream_rows(db: Session, query):
+    """Iterate result rows, fetching EXPORT_CHUNK_SIZE at a time"""
+    return db.execute(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+
+def _patients_row(row):
+    return [
+        row.id,
+        row.patient_id,
+        row.name,
+        row.age,
+        "Male" if row.sex == 1 else "Female",
+        row.phone,
+        get_chest_pain_text(row.cp),
+        row.trestbps,
+        row.chol,
+        row.thalach,
+        row.prediction,
+        f"{row.risk_probability * 100:.2f}%",
+        row.doctor_notes or "",
+        row.created_at.strftime("%Y-%m-%d %H:%M")
     ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Get high-risk predictions
-    predictions = db.query(PredictionHistory)\
-        .join(PatientProfile)\
-        .filter(PredictionHistory.prediction == "High Risk")\
-        .order_by(PredictionHistory.risk_probability.desc())\
-        .all()
-    
-    # Data rows
-    for row_idx, pred in enumerate(predictions, 2):
-        profile = pred.profile
-        
-        data = [
-            profile.patient_id,
-            profile.name,
-            profile.phone,
-            pred.age,
-            "Male" if pred.sex == 1 else "Female",
-            f"{pred.risk_probability:.2f}%",
-            pred.trestbps,
-            pred.chol,
-            pred.created_at.strftime("%Y-%m-%d"),
-            pred.doctor_notes or ""
-        ]
-        
-        for col, value in enumerate(data, 1):
-            cell = ws.cell(row=row_idx, column=col)
-            cell.value = value
-            cell.border = border
-            cell.alignment = Alignment(horizontal="left", vertical="center")
-            
-            # Highlight high risk percentage
-            if col == 6:
-                risk_val = float(value.strip('%'))
-                if risk_val > 80:
-                    cell.fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-                    cell.font = Font(color="FFFFFF", bold=True)
-                elif risk_val > 60:
-                    cell.fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-                    cell.font = Font(bold=True)
-    
-    # Auto-adjust column widths
-    for col in range(1, len(headers) + 1):
-        max_length = 0
-        column = get_column_letter(col)
-        for cell in ws[column]:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column].width = adjusted_width
-    
-    # Freeze header row
+
+
+def _patients_style(col, value):
+    # Color code by risk
+    if col == 11:  # Prediction column
+        if value == "High Risk":
+            return "high_risk"
+        return "low_risk"
+    return None
+
+
+def _high_risk_row(row):
+    return [
+        row.patient_id,
+        row.name,
+        row.phone,
+        row.age,
+        "Male" if row.sex == 1 else "Female",
+        f"{row.risk_probability * 100:.2f}%",
+        row.trestbps,
+        row.chol,
+        row.created_at.strftime("%Y-%m-%d"),
+        row.doctor_notes or ""
+    ]
+
+
+def _high_risk_style(col, value):
+    # Highlight high risk percentage
+    if col == 6:
+        risk_val = float(value.strip('%'))
+        if risk_val > 80:
+            return "critical_risk"
+        elif risk_val > 60:
+            return "elevated_risk"
+    return None
+
+
+def _write_sheet(fileobj, title, headers, header_fill, rows, to_values, style_for):
+    """
+    Write a write-only workbook: rows go straight to a temp file, never held in memory
+
+    Column widths must be declared before the first row in write-only mode,
+    so they are sized from the headers and the first chunk of rows.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
     ws.freeze_panes = "A2"
-    
-    # Save to BytesIO
+
+    rows = iter(rows)
+    first_chunk = []
+    for row in rows:
+        first_chunk.append(to_values(row))
+        if len(first_chunk) >= EXPORT_CHUNK_SIZE:
+            break
+
+    widths = [len(header) for header in headers]
+    for values in first_chunk:
+        for i, value in enumerate(values):
+            widths[i] = max(widths[i], len(str(value)))
+    for col, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = HEADER_FONT
+        cell.alignment = HEADER_ALIGNMENT
+        cell.border = BORDER
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # Registering a style with the workbook hashes it, which dominates the
+    # export if done per cell; register each combination once and copy its
+    # style array onto new cells (as openpyxl's WorksheetCopy does)
+    style_arrays = {}
+
+    def style_array(highlight):
+        if highlight not in style_arrays:
+            template = WriteOnlyCell(ws)
+            template.border = BORDER
+            template.alignment = DATA_ALIGNMENT
+            if highlight is not None:
+                template.fill, template.font = CELL_HIGHLIGHTS[highlight]
+            style_arrays[highlight] = template._style
+        return style_arrays[highlight]
+
+    def append(values):
+        cells = []
+        for col, value in enumerate(values, 1):
+            cell = WriteOnlyCell(ws, value=value)
+            cell._style = copy(style_array(style_for(col, value)))
+            cells.append(cell)
+        ws.append(cells)
+
+    for values in first_chunk:
+        append(values)
+    for row in rows:
+        append(to_values(row))
+
+    wb.save(fileobj)
+
+
+def write_patients_workbook(db: Session, fileobj):
+    """Write all patient predictions as an Excel workbook to fileobj"""
+    _write_sheet(
+        fileobj, "Patient Predictions", PATIENTS_HEADERS, PATIENTS_HEADER_FILL,
+        _stream_rows(db, _export_query()), _patients_row, _patients_style
+    )
+
+
+def write_high_risk_workbook(db: Session, fileobj):
+    """Write high-risk predictions (highest risk first) as an Excel workbook to fileobj"""
+    query = _export_query()\
+        .where(PredictionHistory.prediction == "High Risk")\
+        .order_by(PredictionHistory.risk_probability.desc())
+    _write_sheet(
+        fileobj, "High Risk Patients", HIGH_RISK_HEADERS, HIGH_RISK_HEADER_FILL,
+        _stream_rows(db, query), _high_risk_row, _high_risk_style
+    )
+
+
+def create_patients_excel(db: Session) -> BytesIO:
+    """Create Excel file with all patient predictions"""
     excel_file = BytesIO()
-    wb.save(excel_file)
+    write_patients_workbook(db, excel_file)
     excel_file.seek(0)
-    
     return excel_file
+
+
+def create_high_risk_patients_excel(db: Session) -> BytesIO:
+    """Create Excel file with only high-risk patients"""
+    excel_file = BytesIO()
+    write_high_risk_workbook(db, excel_file)
+    excel_file.seek(0)
+    return excel_file
+
+
+def stream_excel(write_workbook, session_factory=SessionLocal):
+    """Generator of xlsx bytes for StreamingResponse (see app.streaming)"""
+    return stream_output(write_workbook, session_factory)
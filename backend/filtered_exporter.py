@@ -0,0 +1,195 @@
+import csv
+from datetime import datetime, time, timedelta
+from io import StringIO
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database import PredictionHistory, PatientProfile
+from app.schemas import ExportFilters, PredictionFilters
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 1000
+
+# Rows per Parquet row group (one columnar batch held in memory at a time)
+PARQUET_ROW_GROUP_SIZE = 50000
+
+# Same names and units as PredictionHistory.to_dict(), plus the patient's identity
+EXPORT_COLUMNS = [
+    "id", "patient_id", "name", "age", "sex", "cp", "trestbps", "chol", "fbs",
+    "restecg", "thalach", "exang", "oldpeak", "slope", "ca", "thal",
+    "prediction", "risk_probability", "model_version", "doctor_notes", "created_at"
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def validate_filters(filters: PredictionFilters):
+    """Reject filter combinations that can never match (ValueError)"""
+    if filters.date_from and filters.date_to and filters.date_from > filters.date_to:
+        raise ValueError("date_from must not be after date_to")
+    if (filters.min_risk_probability is not None and filters.max_risk_probability is not None
+            and filters.min_risk_probability > filters.max_risk_probability):
+        raise ValueError("min_risk_probability must not exceed max_risk_probability")
+    if filters.age_min and filters.age_max and filters.age_min > filters.age_max:
+        raise ValueError("age_min must not exceed age_max")
+    if getattr(filters, "format", None) == "parquet":
+        _require_pyarrow()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+
+
+def filtered_query(filters: ExportFilters):
+    """Prediction rows matching the filters, oldest first; every filter is a WHERE clause"""
+    query = select(
+        PredictionHistory.id,
+        PatientProfile.patient_id,
+        PatientProfile.name,
+        PredictionHistory.age,
+        PredictionHistory.sex,
+        PredictionHistory.cp,
+        PredictionHistory.trestbps,
+        PredictionHistory.chol,
+        PredictionHistory.fbs,
+        PredictionHistory.restecg,
+        PredictionHistory.thalach,
+        PredictionHistory.exang,
+        PredictionHistory.oldpeak,
+        PredictionHistory.slope,
+        PredictionHistory.ca,
+        PredictionHistory.thal,
+        PredictionHistory.prediction,
+        PredictionHistory.risk_probability,
+        PredictionHistory.model_version,
+        PredictionHistory.doctor_notes,
+        PredictionHistory.created_at,
+    ).outerjoin(PatientProfile, PatientProfile.id == PredictionHistory.profile_id)
+
+    return apply_filters(query, filters).order_by(PredictionHistory.created_at, PredictionHistory.id)
+
+
+def apply_filters(query, filters: PredictionFilters):
+    """Add a WHERE clause per filter (query must join PatientProfile)"""
+    if filters.date_from:
+        query = query.where(PredictionHistory.created_at >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        next_day = datetime.combine(filters.date_to + timedelta(days=1), time.min)
+        query = query.where(PredictionHistory.created_at < next_day)
+    if filters.risk_level:
+        query = query.where(PredictionHistory.prediction == filters.risk_level)
+    if filters.min_risk_probability is not None:
+        query = query.where(PredictionHistory.risk_probability >= filters.min_risk_probability / 100)
+    if filters.max_risk_probability is not None:
+        query = query.where(PredictionHistory.risk_probability <= filters.max_risk_probability / 100)
+    if filters.age_min:
+        query = query.where(PredictionHistory.age >= filters.age_min)
+    if filters.age_max:
+        query = query.where(PredictionHistory.age <= filters.age_max)
+    if filters.patient_ids:
+        query = query.where(PatientProfile.patient_id.in_(filters.patient_ids))
+    return query
+
+
+def _export_values(row):
+    return [
+        row.id,
+        row.patient_id,
+        row.name,
+        row.age,
+        "Male" if row.sex == 1 else "Female",
+        row.cp,
+        row.trestbps,
+        row.chol,
+        row.fbs,
+        row.restecg,
+        row.thalach,
+        row.exang,
+        row.oldpeak,
+        row.slope,
+        row.ca,
+        row.thal,
+        row.prediction,
+        round(row.risk_probability * 100, 2),
+        row.model_version,
+        row.doctor_notes,
+        row.created_at,
+    ]
+
+
+def _partitions(db: Session, filters: ExportFilters, size):
+    result = db.execute(filtered_query(filters).execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    return result.partitions(size)
+
+
+def write_csv(db: Session, fileobj, filters: ExportFilters):
+    """Write matching predictions as UTF-8 CSV, one encoded chunk per fetch"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for rows in _partitions(db, filters, EXPORT_CHUNK_SIZE):
+        for row in rows:
+            values = _export_values(row)
+            values[-1] = row.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            writer.writerow(values)
+        fileobj.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        fileobj.write(buffer.getvalue().encode("utf-8"))
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("patient_id", pa.string()),
+        ("name", pa.string()),
+        ("age", pa.int32()),
+        ("sex", pa.string()),
+        ("cp", pa.int32()),
+        ("trestbps", pa.int32()),
+        ("chol", pa.int32()),
+        ("fbs", pa.int32()),
+        ("restecg", pa.int32()),
+        ("thalach", pa.int32()),
+        ("exang", pa.int32()),
+        ("oldpeak", pa.float64()),
+        ("slope", pa.int32()),
+        ("ca", pa.int32()),
+        ("thal", pa.int32()),
+        ("prediction", pa.string()),
+        ("risk_probability", pa.float64()),
+        ("model_version", pa.string()),
+        ("doctor_notes", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def write_parquet(db: Session, fileobj, filters: ExportFilters):
+    """Write matching predictions as Parquet, one row group per PARQUET_ROW_GROUP_SIZE rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    with pq.ParquetWriter(fileobj, schema, compression="snappy") as writer:
+        for rows in _partitions(db, filters, PARQUET_ROW_GROUP_SIZE):
+            columns = list(zip(*(_export_values(row) for row in rows)))
+            writer.write_batch(pa.record_batch(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+
+
+def filtered_writer(filters: ExportFilters):
+    """`write_output(db, fileobj)` for app.streaming.stream_output"""
+    write = write_parquet if filters.format == "parquet" else write_csv
+    return lambda db, fileobj: write(db, fileobj, filters)
@@ -0,0 +1,223 @@
+"""
+Synthetic heart disease data at capacity-testing volumes
+
+Rows come from train_model.synthetic_frame (the generator behind
+create_sample_dataset), one chunk at a time with its own RandomState seeded
+with [seed, chunk index]. Memory is bounded by --chunk-size, and the same
+seed and chunk size always give the same rows. Outputs, any combination:
+
+    --csv PATH       features and target, appended chunk by chunk
+    --parquet PATH   the same, one row group per chunk
+    --db             PatientProfile and PredictionHistory rows in DATABASE_URL
+
+The database load uses Core executemany inserts, not ORM objects, so it
+keeps the statistics counters up to date itself (apply_statistics_delta in
+each chunk's transaction). Profile ids continue from the table's maximum,
+so no other process should create profiles during a --db run; profiles load
+slower than predictions because the search index triggers
+(setup_profile_search) index every inserted profile.
+Prediction ids come from an IdAllocator, as they do in the API whatever its
+PREDICTION_WRITE_MODE, so predictions never collide with those of a running
+server sharing the database.
+Predictions are spread over the profiles and the last --days days. Each one
+has a stand-in risk probability correlated with the target, and the target
+as its confirmed outcome (training data for train_incremental.py).
+
+Usage (from backend/):
+    python generate_data.py --rows 10000000 [--chunk-size 100000] [--seed 42]
+        [--csv data/synthetic.csv] [--parquet data/synthetic.parquet]
+        [--db] [--profiles 1000000] [--days 365]
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, insert, select
+
+from app.database import PatientProfile, PredictionHistory, apply_statistics_delta, engine, init_db
+from app.write_behind import IdAllocator
+from train_model import synthetic_frame
+
+FIRST_NAMES = np.array(["Mohammad", "Rahim", "Karim", "Ayesha", "Fatima", "Nusrat", "John", "Maria", "Ahmed",
+                        "Sadia", "Tanvir", "Priya", "Rohan", "Emily", "David", "Sara", "Imran", "Nadia"])
+LAST_NAMES = np.array(["Rahman", "Hossain", "Islam", "Khan", "Ahmed", "Chowdhury", "Karim", "Smith",
+                       "Garcia", "Akter", "Uddin", "Sarkar", "Das", "Roy", "Begum", "Alam", "Haque"])
+PROFILE_SEED_OFFSET = 1_000_003  # Profile chunks draw from other streams than row chunks
+
+
+def chunk_sizes(total, chunk_size):
+    """[(chunk index, rows in chunk)] covering `total` rows"""
+    return [(index, min(chunk_size, total - start)) for index, start in enumerate(range(0, total, chunk_size))]
+
+
+def rate(rows, seconds):
+    return f"{rows / seconds:,.0f} rows/s" if seconds > 0 else "-"
+
+
+class FileWriters:
+    """CSV and/or Parquet output, written one chunk at a time"""
+
+    def __init__(self, csv_path=None, parquet_path=None):
+        self.csv_path = csv_path
+        self.parquet_path = parquet_path
+        self._parquet = None
+        self._csv_started = False
+        for path in (csv_path, parquet_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, frame):
+        if self.csv_path:
+            frame.to_csv(self.csv_path, mode="a" if self._csv_started else "w",
+                         header=not self._csv_started, index=False)
+            self._csv_started = True
+        if self.parquet_path:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.parquet_path, table.schema)
+            self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def profile_rows(random, first_id, count, now):
+    """Profile column values for `count` new patients"""
+    first = FIRST_NAMES[random.randint(0, len(FIRST_NAMES), count)]
+    last = LAST_NAMES[random.randint(0, len(LAST_NAMES), count)]
+    years = random.randint(1940, 2000, count)
+    days = random.randint(1, 29, count)
+    months = random.randint(1, 13, count)
+    phones = random.randint(300000000, 999999999, count)
+    genders = np.where(random.randint(0, 2, count) == 1, "Male", "Female")
+    return [
+        dict(id=first_id + i, patient_id=f"SYN{first_id + i:09d}", name=f"{first[i]} {last[i]}",
+             date_of_birth=f"{years[i]}-{months[i]:02d}-{days[i]:02d}", gender=genders[i],
+             phone=f"01{phones[i]}", email=f"{first[i].lower()}.{last[i].lower()}{first_id + i}@example.com",
+             created_at=now, updated_at=now)
+        for i in range(count)
+    ]
+
+
+def load_profiles(db_engine, n_profiles, chunk_size, seed):
+    """Insert synthetic profiles; returns their ids (the only per-profile state kept)"""
+    ids = np.empty(n_profiles, dtype=np.int64)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    offset = 0
+    for index, count in chunk_sizes(n_profiles, chunk_size):
+        random = np.random.RandomState([seed + PROFILE_SEED_OFFSET, index])
+        with db_engine.begin() as conn:
+            # Explicit ids after the current maximum, in the inserting transaction: plain
+            # executemany (RETURNING in parameter order is one statement per row on SQLite)
+            first_id = conn.execute(select(func.coalesce(func.max(PatientProfile.id), 0) + 1)).scalar()
+            rows = profile_rows(random, first_id, count, now)
+            conn.execute(insert(PatientProfile), rows)
+            apply_statistics_delta(conn, patients=count)
+        ids[offset:offset + count] = np.arange(first_id, first_id + count)
+        offset += count
+    elapsed = time.perf_counter() - start
+    print(f"  profiles: {n_profiles:,} in {elapsed:.1f}s ({rate(n_profiles, elapsed)})")
+    return ids
+
+
+def prediction_rows(frame, random, ids, profile_ids, now, days):
+    """PredictionHistory column values for one generated chunk"""
+    count = len(frame)
+    target = frame["target"].to_numpy()
+    # Stand-in for the model's output: correlated with the target, not identical
+    risk = np.clip(target * 0.45 + random.uniform(0.0, 0.55, count), 0.01, 0.99)
+    age_us = (random.uniform(0, days * 86400, count) * 1e6).astype("timedelta64[us]")
+    created = (np.datetime64(now, "us") - age_us).astype(datetime).tolist()
+
+    columns = {name: frame[name].to_numpy().tolist() for name in frame.columns if name != "target"}
+    columns.update(
+        id=ids,
+        profile_id=profile_ids[random.randint(0, len(profile_ids), count)].tolist(),
+        prediction=np.where(risk >= 0.5, "High Risk", "Low Risk").tolist(),
+        risk_probability=risk.tolist(),
+        outcome=target.tolist(),
+        created_at=created,
+        updated_at=created,
+    )
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())], int((risk >= 0.5).sum())
+
+
+def generate(rows, chunk_size=100_000, seed=42, csv_path=None, parquet_path=None,
+             load_db=False, n_profiles=None, days=365, db_engine=engine):
+    """Generate `rows` rows into the requested outputs; prints rows/s per stage"""
+    writers = FileWriters(csv_path, parquet_path)
+    timings = {"generate": 0.0, "files": 0.0, "database": 0.0}
+    total_start = time.perf_counter()
+
+    profile_ids = allocator = None
+    if load_db:
+        init_db(db_engine)
+        n_profiles = n_profiles or max(1, rows // 10)
+        print(f"Loading {n_profiles:,} profiles into {db_engine.url.render_as_string(hide_password=True)}...")
+        profile_ids = load_profiles(db_engine, n_profiles, chunk_size, seed)
+        allocator = IdAllocator(PredictionHistory.__table__, db_engine)
+        allocator.initialize()
+
+    now = datetime.utcnow()
+    print(f"Generating {rows:,} rows in chunks of {chunk_size:,}...")
+    try:
+        for index, count in chunk_sizes(rows, chunk_size):
+            start = time.perf_counter()
+            random = np.random.RandomState([seed, index])
+            frame = synthetic_frame(random, count)
+            timings["generate"] += time.perf_counter() - start
+
+            if csv_path or parquet_path:
+                start = time.perf_counter()
+                writers.write(frame)
+                timings["files"] += time.perf_counter() - start
+
+            if load_db:
+                start = time.perf_counter()
+                records, high_risk = prediction_rows(frame, random, allocator.take(count), profile_ids, now, days)
+                with db_engine.begin() as conn:
+                    conn.execute(insert(PredictionHistory), records)
+                    apply_statistics_delta(conn, predictions=count, high_risk=high_risk,
+                                           low_risk=count - high_risk)
+                timings["database"] += time.perf_counter() - start
+    finally:
+        writers.close()
+
+    for stage, seconds in timings.items():
+        if seconds:
+            print(f"  {stage}: {rows:,} rows in {seconds:.1f}s ({rate(rows, seconds)})")
+    total = time.perf_counter() - total_start
+    print(f"Done in {total:.1f}s ({rate(rows, total)} overall)")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows generated and written at once")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--csv", help="write features and target to this CSV file")
+    parser.add_argument("--parquet", help="write features and target to this Parquet file")
+    parser.add_argument("--db", action="store_true", help="bulk-load profiles and predictions into DATABASE_URL")
+    parser.add_argument("--profiles", type=int, default=None, help="profiles to create with --db (default: rows / 10)")
+    parser.add_argument("--days", type=int, default=365, help="predictions are spread over this many past days")
+    args = parser.parse_args()
+
+    if not (args.csv or args.parquet or args.db):
+        parser.error("choose at least one output: --csv, --parquet or --db")
+    if args.rows < 1 or args.chunk_size < 1 or (args.profiles is not None and args.profiles < 1):
+        parser.error("--rows, --chunk-size and --profiles must be at least 1")
+
+    generate(args.rows, args.chunk_size, args.seed, args.csv, args.parquet,
+             args.db, args.profiles, args.days)
+
+
+if __name__ == "__main__":
+    main()
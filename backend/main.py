@@ -1,22 +1,51 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-import pickle
+from fastapi.responses import StreamingResponse, FileResponse, PlainTextResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import hmac
+import itertools
 import numpy as np
-from typing import List
+from typing import List, Optional
 import os
-from datetime import datetime
+from datetime import datetime, date
 
-from app.database import init_db, get_db, PatientProfile, PredictionHistory
+from app.database import (
+    init_db, get_db, get_async_db, close_db, engine, async_engine,
+    PatientProfile, PredictionHistory, StatisticsSummary, STATISTICS_ROW_ID
+)
+from app.executor import run_blocking, run_cpu_bound, get_process_executor, start_executors, shutdown_executor
 from app.schemas import (
     PredictionInput, PredictionResponse, 
     PatientProfileCreate, PatientProfileResponse,
     PredictionHistoryResponse, PatientTimelineResponse,
-    StatsResponse
+    StatsResponse, BatchPredictionInput, BatchPredictionItem,
+    BatchPredictionResponse, ExportFilters, BulkReportRequest, JobCreate,
+    PredictionOutcome
+)
+from app.report_generator import generate_patient_report, REPORT_TEMPLATE_VERSION
+from app.model_registry import ModelRegistry
+from app.batcher import MicroBatcher
+from app.cache import PredictionCache
+from app.report_cache import ReportCache, report_cache_key
+from app.pagination import paginate, split_page
+from app.jobs import JobQueue, QueueFull
+from app.search import search_profiles as profile_search
+from app.timeline import window_conditions, summary_query, summarize, risk_trend
+from app.write_behind import PREDICTION_WRITE_MODE, WRITE_MODES, IdAllocator, PredictionWriter, prediction_row
+from app.streaming import stream_output
+from app.profiler import SQL_PROFILE, PROFILE_HEADER, N_PLUS_ONE_HEADER, SQLProfilerMiddleware
+from app.metrics import (
+    METRICS_ENABLED, CONTENT_TYPE, metrics, MetricsMiddleware, StageTimer, instrument_engine,
+    PREDICT_STAGE_SECONDS, INFERENCE_SECONDS, INFERENCE_BATCH_SIZE, RENDER_SECONDS
+)
+from excel_exporter import write_patients_workbook, write_high_risk_workbook
+from filtered_exporter import MEDIA_TYPES, validate_filters, filtered_writer
+from bulk_reports import (
+    BULK_REPORT_MAX_ITEMS, BulkReportJobs, cohort_query, cohort_items, stream_report_zip
 )
-from app.report_generator import generate_patient_report
-from excel_exporter import create_patients_excel, create_high_risk_patients_excel
 
 app = FastAPI(
     title="Heart Disease Prediction API - With Patient Profiles",
@@ -31,35 +60,185 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Job-Id", PROFILE_HEADER, N_PLUS_ONE_HEADER],
 )
 
-# Load ML model and scaler
-MODEL_PATH = "models/model.pkl"
-SCALER_PATH = "models/scaler.pkl"
+# Request latency histograms and SQL timings for GET /metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
 
-model = None
-scaler = None
+# Per-request SQL statement log and N+1 detection (opt-in; hooks are installed on the engines in app.database)
+if SQL_PROFILE:
+    app.add_middleware(SQLProfilerMiddleware)
 
-def load_model_and_scaler():
-    global model, scaler
-    
-    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-        raise FileNotFoundError("Model or scaler not found. Please train the model first.")
+# Versioned ML models (the active one is swapped atomically on reload)
+registry = ModelRegistry()
+batcher = None
+
+# Group-commit / write-behind of prediction history (None in the default sync mode)
+prediction_writer = None
+
+# Ids of new prediction_history rows in every write mode, so workers in different
+# modes (and generate_data.py) sharing the database never take the same id
+prediction_id_allocator = IdAllocator()
+
+# Poll the registry's CURRENT pointer every N seconds (0 = only reload via the admin endpoint)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+model_watcher = None
+
+# Shared secret for the /admin endpoints, sent as X-Admin-Key (unset = admin endpoints disabled)
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+# Results for repeated feature vectors (follow-up visits with identical vitals)
+prediction_cache = PredictionCache()
+
+# Rendered PDF reports on disk, keyed by prediction/profile edit time and template version
+report_cache = ReportCache()
+
+# Progress of bulk report downloads
+bulk_report_jobs = BulkReportJobs()
+
+# Reports and exports generated in the background (handlers registered below)
+job_queue = JobQueue()
+
+# Cache and queue counters, exported as gauges on GET /metrics
+metrics.add_snapshot("prediction_cache", prediction_cache.snapshot)
+metrics.add_snapshot("report_cache", report_cache.snapshot)
+metrics.add_snapshot("job_queue", job_queue.snapshot)
+
+# Feature order expected by the model (same as training columns)
+FEATURE_NAMES = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg',
+    'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
+]
+
+def check_feature_order(loaded):
+    """Refuse to serve a model trained on a different feature order"""
+    if loaded.feature_names is not None and list(loaded.feature_names) != FEATURE_NAMES:
+        raise ValueError(f"Model {loaded.version} expects features {loaded.feature_names}, "
+                         f"API sends {FEATURE_NAMES}")
+
+def load_model_and_scaler(version=None):
+    """Load a model version from the registry (default: CURRENT) and make it active"""
+    loaded = registry.activate(version, validate=check_feature_order)
     
-    with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
+    # Cached results are keyed by version; drop the old ones eagerly
+    prediction_cache.clear()
     
-    with open(SCALER_PATH, 'rb') as f:
-        scaler = pickle.load(f)
+    print(f"Model {loaded.version} loaded successfully!")
+    return loaded
+
+async def watch_model_registry():
+    """Reload in the background when the registry's CURRENT version changes"""
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        try:
+            version = registry.current_version()
+            if version and version != registry.active.version:
+                await run_blocking(load_model_and_scaler, version)
+        except Exception as e:
+            print(f"Model reload failed, keeping {registry.active.version}: {e}")
+
+def score_features(model, features, source):
+    """Score a 2D feature matrix with a model, timed for /metrics"""
+    with INFERENCE_SECONDS.time(source):
+        results = model.score_batch(features)
+    INFERENCE_BATCH_SIZE.observe(len(features), source)
+    return results
+
+def extract_features(data: PredictionInput) -> list:
+    """Return the medical parameters of a prediction input in model order"""
+    return [getattr(data, name) for name in FEATURE_NAMES]
+
+def get_recommendations(risk_level: str):
+    """Return (message, recommendations) for a risk level"""
+    if risk_level == "High Risk":
+        recommendations = [
+            "Consult with a cardiologist immediately",
+            "Schedule comprehensive cardiac screening",
+            "Monitor blood pressure and cholesterol regularly",
+            "Adopt a heart-healthy diet",
+            "Engage in regular physical activity",
+            "Avoid smoking and limit alcohol",
+            "Manage stress effectively"
+        ]
+        message = "High risk detected. Please consult a healthcare professional immediately."
+    else:
+        recommendations = [
+            "Continue maintaining a healthy lifestyle",
+            "Regular annual health check-ups",
+            "Balanced diet and exercise",
+            "Monitor vital signs periodically",
+            "Avoid smoking and excessive alcohol"
+        ]
+        message = "Low risk detected. Keep up the good work with healthy habits!"
     
-    print("Model and scaler loaded successfully!")
+    return message, recommendations
+
+def build_prediction_record(profile_id: int, data: PredictionInput, risk_level: str, risk_prob: float, model_version: str) -> PredictionHistory:
+    """Build a PredictionHistory row from the input and the model output"""
+    return PredictionHistory(
+        profile_id=profile_id,
+        age=data.age,
+        sex=data.sex,
+        cp=data.cp,
+        trestbps=data.trestbps,
+        chol=data.chol,
+        fbs=data.fbs,
+        restecg=data.restecg,
+        thalach=data.thalach,
+        exang=data.exang,
+        oldpeak=data.oldpeak,
+        slope=data.slope,
+        ca=data.ca,
+        thal=data.thal,
+        prediction=risk_level,
+        risk_probability=risk_prob,
+        model_version=model_version,
+        doctor_notes=data.doctor_notes
+    )
 
 @app.on_event("startup")
 async def startup_event():
+    global batcher, model_watcher, prediction_writer
+    start_executors()
     init_db()
+    await run_blocking(prediction_id_allocator.initialize)
     load_model_and_scaler()
+    
+    # Concurrent /predict calls are scored together by the micro-batcher
+    batcher = MicroBatcher(lambda features: score_features(registry.active, features, "micro_batch"))
+    batcher.start()
+    
+    metrics.add_snapshot("batcher", batcher.snapshot)
+    
+    if MODEL_WATCH_INTERVAL > 0:
+        model_watcher = asyncio.get_running_loop().create_task(watch_model_registry())
+    
+    if PREDICTION_WRITE_MODE not in WRITE_MODES:
+        raise RuntimeError(f"PREDICTION_WRITE_MODE must be one of {WRITE_MODES}")
+    if PREDICTION_WRITE_MODE != "sync":
+        prediction_writer = PredictionWriter(PREDICTION_WRITE_MODE, allocator=prediction_id_allocator)
+        await prediction_writer.start()
+        metrics.add_snapshot("prediction_writer", prediction_writer.snapshot)
+    
+    job_queue.start()
     print("Database initialized and model loaded!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if model_watcher is not None:
+        model_watcher.cancel()
+    await batcher.stop()
+    if prediction_writer is not None:
+        # Flush every queued prediction before the engines go away
+        await prediction_writer.stop()
+    job_queue.stop()
+    shutdown_executor()
+    await close_db()
+
 @app.get("/")
 async def root():
     return {
@@ -73,10 +252,22 @@ async def root():
         ]
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus metrics (text exposition format)
+    - Request latency per route, /predict stage timings, SQL statement timings
+    - Model inference time and batch sizes, report/export render time
+    - Cache, batcher, writer and job queue counters as gauges
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
 # ============ PATIENT PROFILE ENDPOINTS ============
 
 @app.post("/profiles/create", response_model=PatientProfileResponse)
-async def create_patient_profile(profile: PatientProfileCreate, db: Session = Depends(get_db)):
+def create_patient_profile(profile: PatientProfileCreate, db: Session = Depends(get_db)):
     """Create a new patient profile"""
     
     # Check if patient_id already exists
@@ -103,11 +294,25 @@ async def create_patient_profile(profile: PatientProfileCreate, db: Session = De
     
     return new_profile.to_dict()
 
+@app.get("/profiles/search", response_model=List[PatientProfileResponse])
+def search_profiles(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Search-as-you-type over patient name, phone, email and patient ID
+    
+    - Every word is matched as a prefix ("moh kh" finds "Mohammad Khan")
+    - Best matches first; name matches rank above contact details
+    """
+    return [profile.to_dict() for profile in profile_search(db, q, limit)]
+
 @app.get("/profiles/search/{patient_id}", response_model=PatientProfileResponse)
-async def search_patient_profile(patient_id: str, db: Session = Depends(get_db)):
+def search_patient_profile(patient_id: str, db: Session = Depends(get_db)):
     """Search for a patient by ID"""
     
-    profile = db.query(PatientProfile).filter(
+    profile = db.query(PatientProfile).options(undefer(PatientProfile.prediction_count)).filter(
         PatientProfile.patient_id == patient_id
     ).first()
     
@@ -117,16 +322,39 @@ async def search_patient_profile(patient_id: str, db: Session = Depends(get_db))
     return profile.to_dict()
 
 @app.get("/profiles", response_model=List[PatientProfileResponse])
-async def get_all_profiles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all patient profiles"""
+def get_all_profiles(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get all patient profiles, oldest first
+    
+    - Pass the X-Next-Cursor response header back as `cursor` for the next page
+    - skip/limit still work but get slower the deeper the page
+    """
+    
+    try:
+        query = paginate(
+            db.query(PatientProfile).options(undefer(PatientProfile.prediction_count)),
+            PatientProfile.created_at, PatientProfile.id,
+            limit, skip=skip, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    profiles, next_cursor = split_page(query.all(), limit, lambda p: (p.created_at, p.id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    profiles = db.query(PatientProfile).offset(skip).limit(limit).all()
     return [p.to_dict() for p in profiles]
 
 # ============ PREDICTION WITH PROFILE ============
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_with_profile(data: PredictionInput, db: Session = Depends(get_db)):
+async def predict_with_profile(request: Request, data: PredictionInput, db: AsyncSession = Depends(get_async_db)):
     """
     Predict heart disease risk with patient profile tracking
     
@@ -134,15 +362,24 @@ async def predict_with_profile(data: PredictionInput, db: Session = Depends(get_
     - If profile_data is provided: Create new patient and add prediction
     """
     
+    # Per-stage timings for /metrics; "validation" covers body parsing, validation and dependencies
+    stages = StageTimer(PREDICT_STAGE_SECONDS, request.scope.get("metrics.start"))
+    stages.mark("validation")
+    
     try:
+        # The id is reserved before this request writes anything
+        prediction_id = await prediction_id_allocator.allocate()
+        stages.mark("allocate_id")
+        
         # Get or create patient profile
         is_new_patient = False
         
         if data.patient_id:
             # Existing patient
-            profile = db.query(PatientProfile).filter(
-                PatientProfile.patient_id == data.patient_id
-            ).first()
+            result = await db.execute(
+                select(PatientProfile).where(PatientProfile.patient_id == data.patient_id)
+            )
+            profile = result.scalar_one_or_none()
             
             if not profile:
                 raise HTTPException(status_code=404, detail="Patient not found. Please create profile first.")
@@ -159,77 +396,45 @@ async def predict_with_profile(data: PredictionInput, db: Session = Depends(get_
                 address=data.profile_data.address
             )
             db.add(profile)
-            db.commit()
-            db.refresh(profile)
+            await db.flush()
             is_new_patient = True
         else:
             raise HTTPException(
                 status_code=400, 
                 detail="Either patient_id or profile_data must be provided"
             )
+        stages.mark("profile")
         
-        # Prepare features for prediction
-        features = np.array([[
-            data.age, data.sex, data.cp, data.trestbps, data.chol,
-            data.fbs, data.restecg, data.thalach, data.exang,
-            data.oldpeak, data.slope, data.ca, data.thal
-        ]])
-        
-        # Scale and predict
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
-        probability = model.predict_proba(features_scaled)[0]
-        risk_prob = probability[1]
+        # Predict (cached by feature vector, otherwise batched with other in-flight requests)
+        features = extract_features(data)
+        active = registry.active
+        result = prediction_cache.get(active.version, features)
+        if result is None:
+            prediction, risk_prob, version = await batcher.submit(features)
+            prediction_cache.put(version, features, (prediction, risk_prob))
+        else:
+            prediction, risk_prob = result
+            version = active.version
         risk_level = "High Risk" if prediction == 1 else "Low Risk"
+        stages.mark("inference")
         
         # Save prediction to history
-        new_prediction = PredictionHistory(
-            profile_id=profile.id,
-            age=data.age,
-            sex=data.sex,
-            cp=data.cp,
-            trestbps=data.trestbps,
-            chol=data.chol,
-            fbs=data.fbs,
-            restecg=data.restecg,
-            thalach=data.thalach,
-            exang=data.exang,
-            oldpeak=data.oldpeak,
-            slope=data.slope,
-            ca=data.ca,
-            thal=data.thal,
-            prediction=risk_level,
-            risk_probability=risk_prob,
-            doctor_notes=data.doctor_notes
-        )
+        new_prediction = build_prediction_record(profile.id, data, risk_level, risk_prob, version)
+        new_prediction.id = prediction_id
         
-        db.add(new_prediction)
-        db.commit()
-        db.refresh(new_prediction)
+        if prediction_writer is None:
+            db.add(new_prediction)
+            await db.commit()
+        else:
+            if is_new_patient:
+                await db.commit()
+            await prediction_writer.submit(prediction_row(new_prediction))
+        stages.mark("commit")
         
         # Generate recommendations
-        if risk_level == "High Risk":
-            recommendations = [
-                "Consult with a cardiologist immediately",
-                "Schedule comprehensive cardiac screening",
-                "Monitor blood pressure and cholesterol regularly",
-                "Adopt a heart-healthy diet",
-                "Engage in regular physical activity",
-                "Avoid smoking and limit alcohol",
-                "Manage stress effectively"
-            ]
-            message = "High risk detected. Please consult a healthcare professional immediately."
-        else:
-            recommendations = [
-                "Continue maintaining a healthy lifestyle",
-                "Regular annual health check-ups",
-                "Balanced diet and exercise",
-                "Monitor vital signs periodically",
-                "Avoid smoking and excessive alcohol"
-            ]
-            message = "Low risk detected. Keep up the good work with healthy habits!"
+        message, recommendations = get_recommendations(risk_level)
         
-        return PredictionResponse(
+        response = PredictionResponse(
             prediction_id=new_prediction.id,
             patient_id=profile.patient_id,
             patient_name=profile.name,
@@ -237,48 +442,269 @@ async def predict_with_profile(data: PredictionInput, db: Session = Depends(get_
             risk_probability=round(risk_prob * 100, 2),
             message=message,
             recommendations=recommendations,
-            is_new_patient=is_new_patient
+            is_new_patient=is_new_patient,
+            model_version=version
         )
+        stages.mark("response")
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+def predict_batch(batch: BatchPredictionInput, db: Session = Depends(get_db)):
+    """
+    Predict heart disease risk for many checkups at once (screening camps)
+    
+    - Profiles are resolved with one query and new ones are created together
+    - All records are scaled and scored as a single matrix
+    - All prediction history rows are written in one transaction
+    - Records that cannot be resolved are reported per row, the rest still succeed
+    """
+    
+    records = batch.records
+    items = [BatchPredictionItem(index=i) for i in range(len(records))]
+    
+    # Resolve existing profiles in bulk
+    lookup_ids = set()
+    for data in records:
+        if data.patient_id:
+            lookup_ids.add(data.patient_id)
+        elif data.profile_data:
+            lookup_ids.add(data.profile_data.patient_id)
+    
+    existing = {}
+    if lookup_ids:
+        for profile in db.query(PatientProfile).filter(
+            PatientProfile.patient_id.in_(lookup_ids)
+        ).all():
+            existing[profile.patient_id] = profile
+    
+    # Create new profiles (a new patient repeated in the batch is created once)
+    created = {}
+    row_profiles = [None] * len(records)
+    row_is_new = [False] * len(records)
+    
+    for i, data in enumerate(records):
+        if data.patient_id:
+            profile = existing.get(data.patient_id)
+            if not profile:
+                items[i].error = "Patient not found. Please create profile first."
+                continue
+        elif data.profile_data:
+            new_id = data.profile_data.patient_id
+            if new_id in existing:
+                items[i].error = "Patient ID already exists"
+                continue
+            profile = created.get(new_id)
+            if profile is None:
+                profile = PatientProfile(
+                    patient_id=new_id,
+                    name=data.profile_data.name,
+                    date_of_birth=data.profile_data.date_of_birth,
+                    gender=data.profile_data.gender,
+                    phone=data.profile_data.phone,
+                    email=data.profile_data.email,
+                    address=data.profile_data.address
+                )
+                created[new_id] = profile
+                row_is_new[i] = True
+        else:
+            items[i].error = "Either patient_id or profile_data must be provided"
+            continue
+        
+        row_profiles[i] = profile
+    
+    valid_rows = [i for i in range(len(records)) if row_profiles[i] is not None]
+    
+    if valid_rows:
+        try:
+            # Score all valid records as one matrix (cached feature vectors are skipped)
+            active = registry.active
+            version = active.version
+            row_features = [extract_features(records[i]) for i in valid_rows]
+            results = [prediction_cache.get(version, features) for features in row_features]
+            
+            misses = [j for j, result in enumerate(results) if result is None]
+            if misses:
+                scored = score_features(
+                    active, np.array([row_features[j] for j in misses], dtype=float), "batch_endpoint"
+                )
+                for j, (label, probability, _) in zip(misses, scored):
+                    results[j] = (label, probability)
+                    prediction_cache.put(version, row_features[j], results[j])
+            
+            # Ids come from the shared allocator (reserved before any write)
+            prediction_ids = prediction_id_allocator.take(len(valid_rows))
+            
+            # Write new profiles and all history rows in one transaction
+            db.add_all(created.values())
+            db.flush()
+            
+            new_predictions = []
+            for row, (prediction, risk_prob) in zip(valid_rows, results):
+                risk_level = "High Risk" if prediction == 1 else "Low Risk"
+                new_predictions.append(build_prediction_record(
+                    row_profiles[row].id, records[row], risk_level, risk_prob, version
+                ))
+            for record, prediction_id in zip(new_predictions, prediction_ids):
+                record.id = prediction_id
+            
+            db.add_all(new_predictions)
+            db.flush()
+            
+            # Build responses before commit expires the loaded attributes
+            for row, record in zip(valid_rows, new_predictions):
+                profile = row_profiles[row]
+                message, recommendations = get_recommendations(record.prediction)
+                items[row].result = PredictionResponse(
+                    prediction_id=record.id,
+                    patient_id=profile.patient_id,
+                    patient_name=profile.name,
+                    prediction=record.prediction,
+                    risk_probability=round(record.risk_probability * 100, 2),
+                    message=message,
+                    recommendations=recommendations,
+                    is_new_patient=row_is_new[row],
+                    model_version=version
+                )
+            
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+    
+    return BatchPredictionResponse(
+        total=len(records),
+        succeeded=len(valid_rows),
+        failed=len(records) - len(valid_rows),
+        results=items
+    )
+
+@app.get("/predict/batcher")
+async def get_batcher_stats():
+    """Micro-batcher settings, batch size distribution and queue wait time"""
+    return batcher.snapshot()
+
+@app.get("/predict/writer")
+async def get_writer_stats():
+    """Prediction history write mode, queue depth and group commit sizes"""
+    if prediction_writer is None:
+        return {"mode": "sync"}
+    return prediction_writer.snapshot()
+
+@app.get("/predict/cache")
+async def get_cache_stats():
+    """Inference cache size and hit/miss counts for the current model version"""
+    return {"model_version": registry.active.version, **prediction_cache.snapshot()}
+
+# ============ MODEL MANAGEMENT ============
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only with the configured ADMIN_API_KEY"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_API_KEY is not set)")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Key")
+
+@app.get("/admin/model", dependencies=[Depends(require_admin)])
+async def get_model_info():
+    """Active model version and the versions available in the registry"""
+    active = registry.active
+    return {
+        "active_version": active.version,
+        "loaded_at": active.loaded_at.strftime('%Y-%m-%d %H:%M:%S'),
+        "metadata": active.metadata,
+        "current_version": registry.current_version(),
+        "available_versions": registry.list_versions()
+    }
+
+@app.post("/admin/model/reload", dependencies=[Depends(require_admin)])
+async def reload_model(version: Optional[str] = None):
+    """
+    Load a model version in the background and swap it in atomically
+    
+    - Without version: reload the registry's CURRENT version
+    - In-flight requests finish on the model they started with
+    """
+    previous = registry.active.version
+    try:
+        loaded = await run_blocking(load_model_and_scaler, version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+    
+    return {"previous_version": previous, "active_version": loaded.version}
+
 # ============ PATIENT HISTORY & TIMELINE ============
 
 @app.get("/profiles/{patient_id}/timeline", response_model=PatientTimelineResponse)
-async def get_patient_timeline(patient_id: str, db: Session = Depends(get_db)):
-    """Get patient's complete timeline with all predictions"""
+async def get_patient_timeline(
+    patient_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get patient's timeline, newest first
+    - Window: latest `limit` checkups, optionally within date_from..date_to
+    - Older pages: pass the X-Next-Cursor response header as `cursor`
+    - Summary stats and slope cover the whole window (computed in SQL)
+    """
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
     
-    profile = db.query(PatientProfile).filter(
-        PatientProfile.patient_id == patient_id
-    ).first()
+    result = await db.execute(
+        select(PatientProfile).options(undefer(PatientProfile.prediction_count))
+        .where(PatientProfile.patient_id == patient_id)
+    )
+    profile = result.scalar_one_or_none()
     
     if not profile:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Get all predictions
-    history = db.query(PredictionHistory).filter(
-        PredictionHistory.profile_id == profile.id
-    ).order_by(PredictionHistory.created_at.desc()).all()
+    window = window_conditions(profile.id, date_from, date_to)
+    
+    try:
+        query = paginate(
+            select(PredictionHistory).where(*window),
+            PredictionHistory.created_at, PredictionHistory.id,
+            limit, cursor=cursor, descending=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Analyze trend
-    risk_trend = "stable"
-    if len(history) >= 2:
+    rows = (await db.execute(query)).scalars().all()
+    history, next_cursor = split_page(rows, limit, lambda h: (h.created_at, h.id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    summary_row = (await db.execute(
+        summary_query(window, profile.created_at, db.bind.dialect.name)
+    )).one()
+    
+    # Trend: latest checkup in the window vs the third latest
+    if cursor:
+        recent_risks = (await db.execute(
+            select(PredictionHistory.risk_probability).where(*window)
+            .order_by(PredictionHistory.created_at.desc(), PredictionHistory.id.desc()).limit(3)
+        )).scalars().all()
+    else:
         recent_risks = [h.risk_probability for h in history[:3]]
-        if len(recent_risks) >= 2:
-            if recent_risks[0] < recent_risks[-1]:
-                risk_trend = "improving"
-            elif recent_risks[0] > recent_risks[-1]:
-                risk_trend = "worsening"
     
     return PatientTimelineResponse(
         profile=profile.to_dict(),
         history=[h.to_dict() for h in history],
-        risk_trend=risk_trend
+        risk_trend=risk_trend(recent_risks),
+        summary=summarize(summary_row)
     )
 
 @app.get("/profiles/{patient_id}/latest")
-async def get_latest_prediction(patient_id: str, db: Session = Depends(get_db)):
+def get_latest_prediction(patient_id: str, db: Session = Depends(get_db)):
     """Get patient's latest prediction"""
     
     profile = db.query(PatientProfile).filter(
@@ -297,20 +723,36 @@ async def get_latest_prediction(patient_id: str, db: Session = Depends(get_db)):
     
     return latest.to_dict()
 
+@app.put("/predictions/{prediction_id}/outcome")
+async def record_outcome(prediction_id: int, data: PredictionOutcome, db: AsyncSession = Depends(get_async_db)):
+    """
+    Record the confirmed diagnosis for a prediction
+    - 1 = heart disease confirmed, 0 = ruled out
+    - Predictions with an outcome are the training data of train_incremental.py
+    """
+    prediction = await db.get(PredictionHistory, prediction_id)
+    
+    if not prediction:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    
+    prediction.outcome = data.outcome
+    await db.commit()
+    
+    return {"prediction_id": prediction_id, "outcome": prediction.outcome}
+
 # ============ STATISTICS ============
 
 @app.get("/stats", response_model=StatsResponse)
-async def get_statistics(db: Session = Depends(get_db)):
+async def get_statistics(db: AsyncSession = Depends(get_async_db)):
     """Get overall statistics"""
     
-    total_patients = db.query(PatientProfile).count()
-    total_predictions = db.query(PredictionHistory).count()
-    high_risk = db.query(PredictionHistory).filter(
-        PredictionHistory.prediction == "High Risk"
-    ).count()
-    low_risk = db.query(PredictionHistory).filter(
-        PredictionHistory.prediction == "Low Risk"
-    ).count()
+    # Counters are maintained on every insert, so this is a single-row read
+    summary = await db.get(StatisticsSummary, STATISTICS_ROW_ID)
+    
+    total_patients = summary.total_patients
+    total_predictions = summary.total_predictions
+    high_risk = summary.high_risk_count
+    low_risk = summary.low_risk_count
     
     return StatsResponse(
         total_patients=total_patients,
@@ -323,92 +765,315 @@ async def get_statistics(db: Session = Depends(get_db)):
 
 # ============ REPORT GENERATION ============
 
+@app.get("/report/cache")
+async def get_report_cache_stats():
+    """Rendered report cache size and hit/miss counts"""
+    return {"template_version": REPORT_TEMPLATE_VERSION, **report_cache.snapshot()}
+
+
+def build_report_data(prediction, profile):
+    """Data rendered into a prediction's PDF report"""
+    report_data = prediction.to_dict()
+    report_data['name'] = profile.name if profile else "Unknown"
+    report_data['patient_id'] = profile.patient_id if profile else "Unknown"
+    # Dated by its inputs, not by the render, so a cached PDF stays accurate
+    report_data['report_date'] = max(filter(None, [prediction.updated_at or prediction.created_at,
+                                                   profile.updated_at if profile else None]))
+    return report_data
+
+
+def report_key(prediction, profile):
+    return report_cache_key(
+        prediction.id,
+        prediction.updated_at or prediction.created_at,
+        profile.updated_at if profile else None,
+        REPORT_TEMPLATE_VERSION
+    )
+
+
+def report_filename(prediction, profile):
+    patient_id = profile.patient_id if profile else "unknown"
+    return f"patient_{patient_id}_report_{prediction.id}.pdf"
+
+
 @app.get("/report/{prediction_id}")
-async def download_report(prediction_id: int, db: Session = Depends(get_db)):
-    """Generate and download PDF report for a specific prediction"""
+async def download_report(prediction_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Download the PDF report for a specific prediction (rendered once, then cached)"""
     
-    prediction = db.query(PredictionHistory).filter(
-        PredictionHistory.id == prediction_id
-    ).first()
+    prediction = await db.get(PredictionHistory, prediction_id)
     
     if not prediction:
         raise HTTPException(status_code=404, detail="Prediction not found")
     
-    profile = db.query(PatientProfile).filter(
-        PatientProfile.id == prediction.profile_id
-    ).first()
+    profile = await db.get(PatientProfile, prediction.profile_id) if prediction.profile_id else None
     
-    # Prepare data for report
-    report_data = prediction.to_dict()
-    report_data['name'] = profile.name
-    report_data['patient_id'] = profile.patient_id
+    key = report_key(prediction, profile)
+    pdf = await run_blocking(report_cache.get, key)
     
-    # Generate PDF
-    pdf_buffer = generate_patient_report(report_data)
+    if pdf is None:
+        # Generate PDF off the event loop
+        with RENDER_SECONDS.time("report_pdf"):
+            pdf_buffer = await run_cpu_bound(generate_patient_report, build_report_data(prediction, profile))
+        pdf = pdf_buffer.getvalue()
+        await run_blocking(report_cache.put, key, pdf)
     
-    return StreamingResponse(
-        pdf_buffer,
+    return Response(
+        content=pdf,
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f"attachment; filename=patient_{profile.patient_id}_report_{prediction_id}.pdf"
+            "Content-Disposition": f"attachment; filename={report_filename(prediction, profile)}"
+        }
+    )
+
+
+@app.post("/report/bulk")
+async def download_bulk_reports(request: BulkReportRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Download PDF reports for a cohort as one ZIP (streamed)
+    - Cohort: explicit prediction_ids, or filters (same as the filtered export)
+    - Reports render in parallel across the process pool; cached PDFs are reused
+    - Progress: GET /report/bulk/{job_id} with the X-Job-Id response header
+    """
+    if (request.prediction_ids is None) == (request.filters is None):
+        raise HTTPException(status_code=400, detail="Provide either prediction_ids or filters")
+    
+    if request.filters is not None:
+        try:
+            validate_filters(request.filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    result = await db.execute(cohort_query(request.prediction_ids, request.filters))
+    items = cohort_items(result.all())
+    
+    if not items:
+        raise HTTPException(status_code=404, detail="No predictions match the request")
+    if len(items) > BULK_REPORT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cohort has more than {BULK_REPORT_MAX_ITEMS} predictions; narrow the filters"
+        )
+    
+    job = bulk_report_jobs.create(len(items))
+    filename = f"reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    
+    return StreamingResponse(
+        stream_report_zip(job, items, cache=report_cache),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Job-Id": job.id
         }
     )
 
+
+@app.get("/report/bulk/{job_id}")
+async def get_bulk_report_progress(job_id: str):
+    """Progress of a bulk report download"""
+    job = bulk_report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
 # ============ BACKWARD COMPATIBILITY (Old endpoints still work) ============
 
 @app.get("/patients")
-async def get_all_patients_legacy(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Legacy endpoint - returns all predictions"""
-    predictions = db.query(PredictionHistory).order_by(
-        PredictionHistory.created_at.desc()
-    ).offset(skip).limit(limit).all()
+def get_all_patients_legacy(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Legacy endpoint - returns all predictions, newest first (cursor in X-Next-Cursor)"""
+    
+    # One query: predictions joined with their profile's name and patient_id
+    query = db.query(
+        PredictionHistory, PatientProfile.name, PatientProfile.patient_id
+    ).outerjoin(
+        PatientProfile, PatientProfile.id == PredictionHistory.profile_id
+    )
+    
+    try:
+        query = paginate(
+            query, PredictionHistory.created_at, PredictionHistory.id,
+            limit, skip=skip, cursor=cursor, descending=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    rows, next_cursor = split_page(query.all(), limit, lambda row: (row[0].created_at, row[0].id))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     result = []
-    for p in predictions:
-        profile = db.query(PatientProfile).filter(
-            PatientProfile.id == p.profile_id
-        ).first()
-        
+    for p, name, patient_id in rows:
         data = p.to_dict()
-        data['name'] = profile.name if profile else "Unknown"
-        data['patient_id'] = profile.patient_id if profile else "Unknown"
+        data['name'] = name if name is not None else "Unknown"
+        data['patient_id'] = patient_id if patient_id is not None else "Unknown"
         result.append(data)
     
     return result
 
 
-@app.get("/export/patients/excel")
-def export_all_patients_excel(db: Session = Depends(get_db)):
-    """Export all patient predictions to Excel"""
+def stream_response(write_output, filename, media_type, kind):
+    """Stream an export to the client; errors before the first byte become a 500"""
     try:
-        excel_file = create_patients_excel(db)
-        
-        filename = f"heart_disease_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        return StreamingResponse(
-            excel_file,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        # Render time includes waiting for a slow client to drain the stream
+        stream = stream_output(RENDER_SECONDS.wrap(write_output, kind))
+        first_chunk = next(stream)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        itertools.chain([first_chunk], stream),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+def excel_response(write_workbook, filename, kind):
+    return stream_response(
+        write_workbook, filename,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", kind
+    )
+
+
+@app.get("/export/patients/excel")
+def export_all_patients_excel():
+    """Export all patient predictions to Excel (streamed, constant memory)"""
+    filename = f"heart_disease_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return excel_response(write_patients_workbook, filename, "excel_patients")
 
 
 @app.get("/export/high-risk/excel")
-def export_high_risk_patients_excel(db: Session = Depends(get_db)):
-    """Export high-risk patients to Excel"""
+def export_high_risk_patients_excel():
+    """Export high-risk patients to Excel (streamed, constant memory)"""
+    filename = f"high_risk_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return excel_response(write_high_risk_workbook, filename, "excel_high_risk")
+
+
+@app.post("/export/patients/filtered")
+def export_filtered_patients(filters: ExportFilters):
+    """
+    Export predictions matching the filters as CSV or Parquet (streamed)
+    - Filters: date range, risk level, risk % range, age band, patient IDs
+    - All filters run in SQL; rows are written chunk by chunk
+    """
     try:
-        excel_file = create_high_risk_patients_excel(db)
-        
-        filename = f"high_risk_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        return StreamingResponse(
-            excel_file,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        validate_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"filtered_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{filters.format}"
+    return stream_response(
+        filtered_writer(filters), filename, MEDIA_TYPES[filters.format], f"filtered_{filters.format}"
+    )
+
+
+
+# ============ BACKGROUND JOBS ============
+
+def report_job(db: Session, params, fileobj):
+    """Job handler: one prediction's PDF report (cached like /report/{prediction_id})"""
+    prediction = db.get(PredictionHistory, params["prediction_id"])
+    if not prediction:
+        raise ValueError("Prediction not found")
+    profile = db.get(PatientProfile, prediction.profile_id) if prediction.profile_id else None
+    
+    key = report_key(prediction, profile)
+    pdf = report_cache.get(key)
+    if pdf is None:
+        # Render in the process pool; reportlab would hold the GIL in this thread
+        with RENDER_SECONDS.time("report_pdf"):
+            pdf = get_process_executor().submit(
+                generate_patient_report, build_report_data(prediction, profile)
+            ).result().getvalue()
+        report_cache.put(key, pdf)
+    
+    fileobj.write(pdf)
+    return report_filename(prediction, profile), "application/pdf"
+
+
+def excel_job(write_workbook, name, kind):
+    def run(db: Session, params, fileobj):
+        with RENDER_SECONDS.time(kind):
+            write_workbook(db, fileobj)
+        filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        return filename, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return run
+
+
+def filtered_export_job(db: Session, params, fileobj):
+    filters = ExportFilters(**params["filters"])
+    with RENDER_SECONDS.time(f"filtered_{filters.format}"):
+        filtered_writer(filters)(db, fileobj)
+    filename = f"filtered_patients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{filters.format}"
+    return filename, MEDIA_TYPES[filters.format]
+
+
+job_queue.register("report", report_job)
+job_queue.register("excel_patients", excel_job(write_patients_workbook, "heart_disease_patients", "excel_patients"))
+job_queue.register("excel_high_risk", excel_job(write_high_risk_workbook, "high_risk_patients", "excel_high_risk"))
+job_queue.register("filtered_export", filtered_export_job)
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: JobCreate, db: Session = Depends(get_db)):
+    """
+    Queue a report or export to be generated in the background
+    - Poll GET /jobs/{job_id}; download from GET /jobs/{job_id}/download once completed
+    """
+    params = {}
+    if request.kind == "report":
+        if request.prediction_id is None:
+            raise HTTPException(status_code=400, detail="prediction_id is required for report jobs")
+        if db.get(PredictionHistory, request.prediction_id) is None:
+            raise HTTPException(status_code=404, detail="Prediction not found")
+        params["prediction_id"] = request.prediction_id
+    elif request.kind == "filtered_export":
+        filters = request.filters or ExportFilters()
+        try:
+            validate_filters(filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        params["filters"] = filters.model_dump(mode="json")
+    
+    try:
+        return job_queue.submit(request.kind, params)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@app.get("/jobs/queue")
+def get_job_queue_stats():
+    """Job worker pool settings and pending count"""
+    return job_queue.snapshot()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status of a background job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/download")
+def download_job_artifact(job_id: str):
+    """Download a completed job's file"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "expired":
+        raise HTTPException(status_code=410, detail="Job artifact has expired")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != "completed" or not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    
+    return FileResponse(job.artifact_path, media_type=job.media_type, filename=job.filename)
 
 
 if __name__ == "__main__":
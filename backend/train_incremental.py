@@ -0,0 +1,239 @@
+"""
+Out-of-core training on prediction_history rows with a confirmed outcome
+
+The table is read in keyset-paginated chunks (WHERE id > last id ORDER BY
+id LIMIT chunk), so memory is bounded by INCREMENTAL_CHUNK_SIZE whatever
+the table size:
+
+    pass 0      StandardScaler.partial_fit over every training row
+    epochs      SGDClassifier(log_loss).partial_fit on the scaled chunks
+    evaluation  accuracy and log loss on the held-out rows
+
+Scaling statistics are complete before the first gradient step, so the
+model is never fitted against a scale that is still moving. Rows whose id
+falls in the holdout (id % INCREMENTAL_HOLDOUT_MODULO == 0) are never
+trained on. State is checkpointed after every chunk; rerunning the command
+resumes where it stopped. Rows added during a run are left for the next one
+(the run is pinned to the highest id seen when it started).
+
+Usage (from backend/):
+    python train_incremental.py [--chunk-size 5000] [--epochs 3] [--restart] [--no-publish]
+"""
+import argparse
+import os
+import pickle
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+from app.database import PredictionHistory, engine
+from app.model_registry import ModelRegistry
+
+# Defaults of the command-line options: rows per query, passes over the data and
+# the SGD regularization strength
+INCREMENTAL_CHUNK_SIZE = int(os.getenv("INCREMENTAL_CHUNK_SIZE", "5000"))
+INCREMENTAL_EPOCHS = int(os.getenv("INCREMENTAL_EPOCHS", "3"))
+INCREMENTAL_ALPHA = float(os.getenv("INCREMENTAL_ALPHA", "0.001"))
+# One row in this many (by id) is held out for evaluation
+INCREMENTAL_HOLDOUT_MODULO = int(os.getenv("INCREMENTAL_HOLDOUT_MODULO", "10"))
+INCREMENTAL_CHECKPOINT = os.getenv("INCREMENTAL_CHECKPOINT", "models/incremental_checkpoint.pkl")
+
+# Same order as the API (main.FEATURE_NAMES) and train_model.py
+FEATURE_NAMES = [
+    'age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg',
+    'thalach', 'exang', 'oldpeak', 'slope', 'ca', 'thal'
+]
+CLASSES = np.array([0, 1])
+
+# Checkpoint phases, in order
+PHASE_SCALER = "scaler"
+PHASE_TRAIN = "train"
+PHASE_EVALUATE = "evaluate"
+PHASE_DONE = "done"
+
+
+def read_chunks(conn, after_id, max_id, chunk_size, holdout_modulo, holdout):
+    """
+    Yield (last id, features, outcomes) for labelled rows after `after_id`
+
+    Each chunk is one query resuming after the previous chunk's last id,
+    so the scan uses the primary key and nothing beyond one chunk is held.
+    """
+    table = PredictionHistory.__table__
+    columns = [table.c[name] for name in FEATURE_NAMES]
+    in_holdout = (table.c.id % holdout_modulo) == 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.outcome, *columns)
+            .where(table.c.id > after_id, table.c.id <= max_id, table.c.outcome.isnot(None),
+                   in_holdout if holdout else ~in_holdout)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        data = np.array(rows, dtype=float)
+        after_id = int(data[-1, 0])
+        yield after_id, data[:, 2:], data[:, 1].astype(int)
+
+
+class Checkpoint:
+    """Training state saved after every chunk (written to a temporary file, then renamed)"""
+
+    def __init__(self, settings, max_id):
+        self.settings = settings
+        self.max_id = max_id
+        self.phase = PHASE_SCALER
+        self.epoch = 0
+        self.last_id = 0  # Last row id processed in the current phase/epoch
+        self.rows_seen = 0
+        self.scaler = StandardScaler()
+        self.model = SGDClassifier(loss="log_loss", alpha=settings["alpha"], random_state=42)
+        self.evaluation = {"rows": 0, "correct": 0, "log_loss_sum": 0.0}
+        self.started_at = datetime.utcnow()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            # A plain dict, so the file loads whether this module ran as a script or was imported
+            pickle.dump(vars(self), f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            fields = pickle.load(f)
+        state = cls.__new__(cls)
+        state.__dict__.update(fields)
+        return state
+
+    def next_phase(self, phase, epoch=0):
+        self.phase = phase
+        self.epoch = epoch
+        self.last_id = 0
+
+
+def train_incremental(chunk_size=INCREMENTAL_CHUNK_SIZE, epochs=INCREMENTAL_EPOCHS, alpha=INCREMENTAL_ALPHA,
+                      holdout_modulo=INCREMENTAL_HOLDOUT_MODULO, checkpoint_path=INCREMENTAL_CHECKPOINT,
+                      restart=False, publish=True, db_engine=engine):
+    """Run (or resume) an incremental training; returns the final checkpoint"""
+    settings = {"chunk_size": chunk_size, "epochs": epochs, "alpha": alpha, "holdout_modulo": holdout_modulo}
+
+    state = None if restart else Checkpoint.load(checkpoint_path)
+    if state is not None and state.phase == PHASE_DONE:
+        state = None
+    if state is not None and state.settings != settings:
+        raise SystemExit(f"Checkpoint {checkpoint_path} was made with {state.settings}; "
+                         f"rerun with the same settings or pass --restart")
+    if state is None:
+        with db_engine.connect() as conn:
+            max_id = conn.execute(select(func.coalesce(func.max(PredictionHistory.id), 0))).scalar()
+        state = Checkpoint(settings, max_id)
+        print(f"Training on labelled predictions with id <= {max_id}")
+    else:
+        print(f"Resuming from {checkpoint_path}: {state.phase} phase, epoch {state.epoch}, "
+              f"after id {state.last_id}")
+
+    def run_phase(label, holdout, step):
+        start = time.perf_counter()
+        rows = 0
+        with db_engine.connect() as conn:
+            for last_id, X, y in read_chunks(conn, state.last_id, state.max_id, chunk_size,
+                                             holdout_modulo, holdout):
+                step(X, y)
+                rows += len(y)
+                state.last_id = last_id
+                state.save(checkpoint_path)
+        elapsed = time.perf_counter() - start
+        print(f"  {label}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+    if state.phase == PHASE_SCALER:
+        def fit_scaler(X, y):
+            state.scaler.partial_fit(X)
+            state.rows_seen += len(y)
+        run_phase("scaler statistics", False, fit_scaler)
+        if state.rows_seen == 0:
+            raise SystemExit("No predictions with a confirmed outcome to train on "
+                             "(record them with PUT /predictions/{id}/outcome)")
+        state.next_phase(PHASE_TRAIN)
+        state.save(checkpoint_path)
+
+    while state.phase == PHASE_TRAIN:
+        rng = np.random.default_rng(state.epoch)
+
+        def fit_model(X, y):
+            order = rng.permutation(len(y))  # Shuffle within the chunk; chunks stay in id order
+            state.model.partial_fit(state.scaler.transform(X[order]), y[order], classes=CLASSES)
+        run_phase(f"epoch {state.epoch + 1}/{epochs}", False, fit_model)
+
+        if state.epoch + 1 < epochs:
+            state.next_phase(PHASE_TRAIN, state.epoch + 1)
+        else:
+            state.next_phase(PHASE_EVALUATE)
+        state.save(checkpoint_path)
+
+    if state.phase == PHASE_EVALUATE:
+        def evaluate(X, y):
+            probabilities = np.clip(state.model.predict_proba(state.scaler.transform(X))[:, 1], 1e-15, 1 - 1e-15)
+            state.evaluation["rows"] += len(y)
+            state.evaluation["correct"] += int(((probabilities >= 0.5).astype(int) == y).sum())
+            state.evaluation["log_loss_sum"] += float(
+                -(y * np.log(probabilities) + (1 - y) * np.log(1 - probabilities)).sum()
+            )
+        run_phase("holdout evaluation", True, evaluate)
+        state.next_phase(PHASE_DONE)
+        state.save(checkpoint_path)
+
+    evaluation = state.evaluation
+    accuracy = evaluation["correct"] / evaluation["rows"] if evaluation["rows"] else None
+    log_loss = evaluation["log_loss_sum"] / evaluation["rows"] if evaluation["rows"] else None
+    print(f"\nTrained on {state.rows_seen} rows, {epochs} epochs")
+    if accuracy is not None:
+        print(f"Holdout ({evaluation['rows']} rows): accuracy {accuracy:.2%}, log loss {log_loss:.4f}")
+    else:
+        print("Holdout is empty; no evaluation")
+
+    if publish:
+        registry = ModelRegistry()
+        version = registry.publish(state.model, state.scaler, FEATURE_NAMES, metadata={
+            'algorithm': f"SGDClassifier(log_loss, alpha={alpha}), incremental",
+            'accuracy': round(accuracy, 4) if accuracy is not None else None,
+            'log_loss': round(log_loss, 4) if log_loss is not None else None,
+            'n_samples': state.rows_seen,
+            'holdout_samples': evaluation["rows"],
+            'epochs': epochs,
+            'max_prediction_id': state.max_id,
+            'trained_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        print(f"Published registry version {version}: {registry.registry_dir}/{version}/model.json")
+
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=INCREMENTAL_CHUNK_SIZE, help="rows per query")
+    parser.add_argument("--epochs", type=int, default=INCREMENTAL_EPOCHS)
+    parser.add_argument("--alpha", type=float, default=INCREMENTAL_ALPHA, help="SGD regularization strength")
+    parser.add_argument("--holdout-modulo", type=int, default=INCREMENTAL_HOLDOUT_MODULO,
+                        help="hold out rows whose id is divisible by this")
+    parser.add_argument("--checkpoint", default=INCREMENTAL_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--no-publish", action="store_true", help="do not publish the model to the registry")
+    args = parser.parse_args()
+    if args.chunk_size < 1 or args.epochs < 1 or args.holdout_modulo < 2:
+        parser.error("--chunk-size and --epochs must be at least 1, --holdout-modulo at least 2")
+
+    train_incremental(args.chunk_size, args.epochs, args.alpha, args.holdout_modulo, args.checkpoint,
+                      restart=args.restart, publish=not args.no_publish)
+
+
+if __name__ == "__main__":
+    main()
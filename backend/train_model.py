@@ -1,31 +1,69 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.model_selection import train_test_split, ParameterGrid, StratifiedKFold
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
+import argparse
+import json
 import pickle
 import os
+import time
+from datetime import datetime
+from app.model_registry import ModelRegistry
+from app.scorer import CompiledScorer
 
-def create_sample_dataset():
+# Hyperparameter search (python train_model.py --search). Only linear models
+# are candidates: the served artifact (model.json) is a scaler folded into
+# logistic coefficients, so anything without coef_/intercept_ could not be served.
+# "penalty" is l1, l2 or elasticnet (with l1_ratio) for both model families.
+SEARCH_GRID = [
+    {"model": "logistic_regression",
+     "params": {"C": [0.01, 0.1, 1.0, 10.0], "penalty": ["l2"], "solver": ["lbfgs"],
+                "class_weight": [None, "balanced"]}},
+    {"model": "logistic_regression",
+     "params": {"C": [0.1, 1.0, 10.0], "penalty": ["l1"], "solver": ["liblinear"]}},
+    {"model": "sgd_log_loss",
+     "params": {"alpha": [0.0001, 0.001, 0.01], "penalty": ["l2", "elasticnet"]}},
+]
+SEARCH_FOLDS = 5
+# Objective = mean CV AUC - LATENCY_WEIGHT * (latency / fastest candidate's latency - 1),
+# i.e. with 0.01 a candidate twice as slow must be 0.01 AUC better to win
+SEARCH_LATENCY_WEIGHT = 0.01
+# Latencies within this fraction of the fastest (or within the timing spread)
+# count as equal and are not penalized: the grid's linear models all compile
+# to the same dot product, so their differences are timer noise
+SEARCH_LATENCY_TOLERANCE = 0.2
+SEARCH_LATENCY_ROUNDS = 30
+SEARCH_REPORT_FILENAME = "search_report.json"
+
+def create_sample_dataset(n_samples=1000, seed=42):
     """Create a realistic sample heart disease dataset"""
-    np.random.seed(42)
-    n_samples = 1000
-    
+    np.random.seed(seed)
+    return synthetic_frame(np.random, n_samples)
+
+def synthetic_frame(random, n_samples):
+    """
+    n_samples synthetic patients with a target, drawn from `random`
+    (the np.random module or a np.random.RandomState; generate_data.py
+    uses one RandomState per chunk)
+    """
     data = {
-        'age': np.random.randint(30, 80, n_samples),
-        'sex': np.random.randint(0, 2, n_samples),  # 0: female, 1: male
-        'cp': np.random.randint(0, 4, n_samples),  # chest pain type
-        'trestbps': np.random.randint(90, 200, n_samples),  # resting blood pressure
-        'chol': np.random.randint(120, 400, n_samples),  # cholesterol
-        'fbs': np.random.randint(0, 2, n_samples),  # fasting blood sugar
-        'restecg': np.random.randint(0, 3, n_samples),  # resting ECG
-        'thalach': np.random.randint(70, 200, n_samples),  # max heart rate
-        'exang': np.random.randint(0, 2, n_samples),  # exercise induced angina
-        'oldpeak': np.random.uniform(0, 6, n_samples),  # ST depression
-        'slope': np.random.randint(0, 3, n_samples),  # slope of peak exercise ST
-        'ca': np.random.randint(0, 4, n_samples),  # number of major vessels
-        'thal': np.random.randint(0, 4, n_samples)  # thalassemia
+        'age': random.randint(30, 80, n_samples),
+        'sex': random.randint(0, 2, n_samples),  # 0: female, 1: male
+        'cp': random.randint(0, 4, n_samples),  # chest pain type
+        'trestbps': random.randint(90, 200, n_samples),  # resting blood pressure
+        'chol': random.randint(120, 400, n_samples),  # cholesterol
+        'fbs': random.randint(0, 2, n_samples),  # fasting blood sugar
+        'restecg': random.randint(0, 3, n_samples),  # resting ECG
+        'thalach': random.randint(70, 200, n_samples),  # max heart rate
+        'exang': random.randint(0, 2, n_samples),  # exercise induced angina
+        'oldpeak': random.uniform(0, 6, n_samples),  # ST depression
+        'slope': random.randint(0, 3, n_samples),  # slope of peak exercise ST
+        'ca': random.randint(0, 4, n_samples),  # number of major vessels
+        'thal': random.randint(0, 4, n_samples)  # thalassemia
     }
     
     df = pd.DataFrame(data)
@@ -40,7 +78,7 @@ def create_sample_dataset():
         (df['thalach'] < 120).astype(int) * 2 +
         (df['exang'] == 1).astype(int) * 2 +
         (df['oldpeak'] > 2).astype(int) * 1.5 +
-        np.random.uniform(0, 2, n_samples)
+        random.uniform(0, 2, n_samples)
     )
     
     df['target'] = (risk_score > 6).astype(int)  # 1: high risk, 0: low risk
@@ -93,13 +131,243 @@ def train_model():
     with open('models/scaler.pkl', 'wb') as f:
         pickle.dump(scaler, f)
     
+    # Publish a new version to the model registry (served after reload)
+    registry = ModelRegistry()
+    version = registry.publish(model, scaler, list(X.columns), metadata={
+        'algorithm': 'LogisticRegression',
+        'accuracy': round(float(accuracy), 4),
+        'n_samples': len(df),
+        'trained_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    
     print("\nModel and scaler saved successfully!")
     print("Files created:")
     print("- models/model.pkl")
     print("- models/scaler.pkl")
+    print(f"- {registry.registry_dir}/{version}/model.json (registry version {version})")
     print("- data/heart_disease_data.csv")
     
     return model, scaler, accuracy
 
+def _sklearn_version():
+    return tuple(int(part) for part in sklearn.__version__.split(".")[:2])
+
+def build_estimator(name, params):
+    """Unfitted estimator for a grid entry"""
+    params = dict(params)
+    if name == "logistic_regression":
+        penalty = params.pop("penalty", "l2")
+        l1_ratio = params.pop("l1_ratio", 0.5 if penalty == "elasticnet" else None)
+        if _sklearn_version() >= (1, 8):
+            # scikit-learn 1.8 replaced `penalty` with l1_ratio (0 = l2, 1 = l1)
+            params["l1_ratio"] = {"l2": 0.0, "l1": 1.0}.get(penalty, l1_ratio)
+        else:
+            params["penalty"] = penalty
+            if penalty == "elasticnet":
+                params["l1_ratio"] = l1_ratio
+        return LogisticRegression(random_state=42, max_iter=5000, **params)
+    if name == "sgd_log_loss":
+        return SGDClassifier(loss="log_loss", random_state=42, max_iter=2000, tol=1e-4, **params)
+    raise ValueError(f"Unknown model '{name}' in search grid")
+
+def expand_grid(grid):
+    """[(model name, params)] for every combination in the grid"""
+    return [(entry["model"], params) for entry in grid for params in ParameterGrid(entry["params"])]
+
+def describe(name, params):
+    return name + "(" + ", ".join(f"{key}={value}" for key, value in sorted(params.items())) + ")"
+
+def fit_scaled(name, params, X, y):
+    """Fit a scaler and an estimator on (X, y); returns (model, scaler, fit seconds)"""
+    start = time.perf_counter()
+    scaler = StandardScaler().fit(X)
+    model = build_estimator(name, params).fit(scaler.transform(X), y)
+    return model, scaler, time.perf_counter() - start
+
+def evaluate_fold(index, name, params, X, y, train_idx, val_idx):
+    """Fit on one fold's training part, AUC on its validation part (runs in a worker)"""
+    model, scaler, fit_seconds = fit_scaled(name, params, X[train_idx], y[train_idx])
+    probabilities = model.predict_proba(scaler.transform(X[val_idx]))[:, 1]
+    return index, fit_seconds, roc_auc_score(y[val_idx], probabilities)
+
+def measure_latencies(scorers, X, rounds=SEARCH_LATENCY_ROUNDS, repeat=100, batch_size=256):
+    """
+    Serving latency of compiled models in microseconds, timed in interleaved rounds
+
+    Every round times each scorer in turn (score_batch for one row, as for a
+    lone /predict, and per row for a full batch), so drift in machine load
+    hits all candidates alike. Returns per scorer the median of the round
+    medians and their interquartile range (the timing noise).
+    """
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(repeat)]
+    batch = X[np.arange(batch_size) % len(X)]
+    single = [[] for _ in scorers]
+    batched = [[] for _ in scorers]
+    for _ in range(rounds):
+        for index, scorer in enumerate(scorers):
+            timings = []
+            for row in rows:
+                start = time.perf_counter()
+                scorer.score_batch(row)
+                timings.append(time.perf_counter() - start)
+            single[index].append(np.median(timings) * 1e6)
+            start = time.perf_counter()
+            scorer.score_batch(batch)
+            batched[index].append((time.perf_counter() - start) / batch_size * 1e6)
+    
+    def summary(samples):
+        q25, median, q75 = np.percentile(samples, [25, 50, 75])
+        return float(median), float(q75 - q25)
+    
+    return [summary(single[i]) + (summary(batched[i])[0],) for i in range(len(scorers))]
+
+def latency_penalty(latency, spread, fastest, fastest_spread, tolerance=SEARCH_LATENCY_TOLERANCE):
+    """Relative slowdown against the fastest candidate, or 0 when within noise"""
+    if latency - fastest <= max(tolerance * fastest, spread, fastest_spread):
+        return 0.0
+    return latency / fastest - 1
+
+def search_models(grid=None, n_jobs=-1, folds=SEARCH_FOLDS, latency_weight=SEARCH_LATENCY_WEIGHT,
+                  n_samples=1000):
+    """
+    Cross-validate every grid candidate in parallel and publish the best one
+
+    Fold fits run across all cores (n_jobs=-1). Each candidate is then
+    refit on the whole training split, compiled like the server does, and
+    timed on one core in interleaved rounds. The winner maximizes the
+    objective described at SEARCH_LATENCY_WEIGHT (candidates of equal cost
+    are ranked by CV AUC, then fit time); its test-set metrics and the full candidate table
+    are saved as search_report.json in its registry version.
+    """
+    grid = grid or SEARCH_GRID
+    candidates = expand_grid(grid)
+    
+    print("Creating sample dataset...")
+    df = create_sample_dataset(n_samples=n_samples)
+    feature_names = list(df.drop('target', axis=1).columns)
+    X = df[feature_names].to_numpy(dtype=float)
+    y = df['target'].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X_train, y_train))
+    print(f"Cross-validating {len(candidates)} candidates x {folds} folds (n_jobs={n_jobs})...")
+    start = time.perf_counter()
+    fold_results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(index, name, params, X_train, y_train, train_idx, val_idx)
+        for index, (name, params) in enumerate(candidates)
+        for train_idx, val_idx in splits
+    )
+    search_seconds = time.perf_counter() - start
+    
+    results = []
+    for index, (name, params) in enumerate(candidates):
+        fits = [(fit_seconds, auc) for i, fit_seconds, auc in fold_results if i == index]
+        aucs = [auc for _, auc in fits]
+        model, scaler, fit_seconds = fit_scaled(name, params, X_train, y_train)
+        results.append({
+            "candidate": describe(name, params),
+            "model": name,
+            "params": params,
+            "cv_auc_mean": float(np.mean(aucs)),
+            "cv_auc_std": float(np.std(aucs)),
+            "fit_seconds_mean": float(np.mean([fit for fit, _ in fits])),
+            "refit_seconds": fit_seconds,
+            "nonzero_weights": int(np.count_nonzero(model.coef_)),
+            "_fitted": (model, scaler),
+        })
+    
+    print(f"Timing {len(results)} compiled models ({SEARCH_LATENCY_ROUNDS} interleaved rounds)...")
+    latencies = measure_latencies(
+        [CompiledScorer.from_sklearn(*result["_fitted"]) for result in results], X_test
+    )
+    for result, (latency_us, spread_us, batch_us_per_row) in zip(results, latencies):
+        result.update(latency_us=latency_us, latency_spread_us=spread_us, batch_us_per_row=batch_us_per_row)
+    
+    fastest_result = min(results, key=lambda result: result["latency_us"])
+    fastest = fastest_result["latency_us"]
+    for result in results:
+        result["latency_penalty"] = latency_penalty(
+            result["latency_us"], result["latency_spread_us"], fastest, fastest_result["latency_spread_us"]
+        )
+        result["objective"] = result["cv_auc_mean"] - latency_weight * result["latency_penalty"]
+    results.sort(key=lambda result: (-result["objective"], result["fit_seconds_mean"]))
+    
+    print(f"\n{'candidate':<72} {'cv auc':>7} {'fit ms':>7} {'lat us':>7} {'objective':>9}")
+    for result in results:
+        print(f"{result['candidate'][:72]:<72} {result['cv_auc_mean']:>7.4f} "
+              f"{result['fit_seconds_mean'] * 1000:>7.1f} {result['latency_us']:>7.2f} {result['objective']:>9.4f}")
+    
+    winner = results[0]
+    model, scaler = winner["_fitted"]
+    probabilities = model.predict_proba(scaler.transform(X_test))[:, 1]
+    y_pred = model.predict(scaler.transform(X_test))
+    accuracy = accuracy_score(y_test, y_pred)
+    test_auc = roc_auc_score(y_test, probabilities)
+    
+    print(f"\nSelected {winner['candidate']}")
+    print(f"Test AUC: {test_auc:.4f}  Accuracy: {accuracy:.2%}")
+    print(classification_report(y_test, y_pred, target_names=['Low Risk', 'High Risk']))
+    
+    report = {
+        "selected": winner["candidate"],
+        "objective": (f"cv_auc_mean - {latency_weight} * (latency_us / {fastest:.3f} - 1), "
+                      f"no penalty within {SEARCH_LATENCY_TOLERANCE:.0%} or the timing spread"),
+        "test_auc": round(float(test_auc), 4),
+        "test_accuracy": round(float(accuracy), 4),
+        "folds": folds,
+        "n_jobs": n_jobs,
+        "n_samples": len(df),
+        "search_seconds": round(search_seconds, 3),
+        "sklearn_version": sklearn.__version__,
+        "grid": grid,
+        "candidates": [{key: value for key, value in result.items() if key != "_fitted"} for result in results],
+    }
+    
+    # Publish without switching CURRENT until the report is next to the artifact
+    registry = ModelRegistry()
+    version = registry.publish(model, scaler, feature_names, make_current=False, metadata={
+        'algorithm': winner["candidate"],
+        'accuracy': round(float(accuracy), 4),
+        'auc': round(float(test_auc), 4),
+        'cv_auc': round(winner["cv_auc_mean"], 4),
+        'latency_us': round(winner["latency_us"], 3),
+        'n_samples': len(df),
+        'trained_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    report_path = os.path.join(registry.registry_dir, version, SEARCH_REPORT_FILENAME)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    registry.set_current(version)
+    
+    print(f"Published registry version {version}")
+    print(f"- {registry.registry_dir}/{version}/model.json")
+    print(f"- {report_path}")
+    
+    return model, scaler, report
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the heart disease model")
+    parser.add_argument("--search", action="store_true",
+                        help="cross-validate the hyperparameter grid and publish the best model")
+    parser.add_argument("--grid", help="JSON file with a search grid (default: SEARCH_GRID)")
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits (-1 = all cores)")
+    parser.add_argument("--folds", type=int, default=SEARCH_FOLDS)
+    parser.add_argument("--latency-weight", type=float, default=SEARCH_LATENCY_WEIGHT)
+    parser.add_argument("--samples", type=int, default=1000, help="size of the generated dataset")
+    args = parser.parse_args()
+    
+    if not args.search:
+        train_model()
+        return
+    
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    search_models(grid, n_jobs=args.jobs, folds=args.folds, latency_weight=args.latency_weight,
+                  n_samples=args.samples)
+
 if __name__ == "__main__":
-    train_model()
+    main()
@@ -11,6 +11,8 @@ const PatientTimeline = ({ patientId }) => {
   const [timeline, setTimeline] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchTimeline();
@@ -20,6 +22,7 @@ const PatientTimeline = ({ patientId }) => {
     try {
       const response = await axios.get(`${API_URL}/profiles/${patientId}/timeline`);
       setTimeline(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (err) {
       setError('Failed to load patient timeline');
     } finally {
@@ -27,6 +30,24 @@ const PatientTimeline = ({ patientId }) => {
     }
   };
 
+  // The timeline is paged (newest first); older checkups follow the cursor
+  const fetchOlder = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API_URL}/profiles/${patientId}/timeline`, {
+        params: { cursor: nextCursor }
+      });
+      setTimeline(current => ({ ...current, history: [...current.history, ...response.data.history] }));
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      setError('Failed to load patient timeline');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const totalCheckups = timeline?.summary?.count ?? timeline?.history.length ?? 0;
+
   if (loading) {
     return (
       <div className="flex items-center justify-center p-8">
@@ -271,6 +292,25 @@ const PatientTimeline = ({ patientId }) => {
             </div>
           ))}
         </div>
+
+        {nextCursor && (
+          <div className="mt-6 text-center">
+            <p className="text-sm text-gray-600 dark:text-gray-400 mb-2">
+              {language === 'en'
+                ? `Showing ${timeline.history.length} of ${totalCheckups} checkups`
+                : `${totalCheckups}টির মধ্যে ${timeline.history.length}টি চেকআপ দেখানো হচ্ছে`}
+            </p>
+            <button
+              onClick={fetchOlder}
+              disabled={loadingMore}
+              className="px-4 py-2 rounded-lg bg-purple-600 text-white hover:bg-purple-700 disabled:opacity-50"
+            >
+              {loadingMore
+                ? (language === 'en' ? 'Loading...' : 'লোড হচ্ছে...')
+                : (language === 'en' ? 'Load older checkups' : 'পুরনো চেকআপ দেখুন')}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
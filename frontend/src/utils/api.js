@@ -17,6 +17,14 @@ export const searchPatient = async (patientId) => {
   return response.data;
 };
 
+// Search-as-you-type over name, phone, email and patient ID
+export const searchPatients = async (query, limit = 10) => {
+  const response = await api.get('/profiles/search', {
+    params: { q: query, limit }
+  });
+  return response.data;
+};
+
 // Create patient profile
 export const createPatientProfile = async (profileData) => {
   const response = await api.post('/profiles/create', profileData);
@@ -135,7 +143,7 @@ export const exportFilteredPatients = async (filters) => {
     const url = window.URL.createObjectURL(new Blob([response.data]));
     const link = document.createElement('a');
     link.href = url;
-    link.setAttribute('download', `filtered_patients_${new Date().toISOString().split('T')[0]}.xlsx`);
+    link.setAttribute('download', `filtered_patients_${new Date().toISOString().split('T')[0]}.${filters.format || 'csv'}`);
     document.body.appendChild(link);
     link.click();
     link.parentNode.removeChild(link);